@@ -0,0 +1,167 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.core.cache import cache, caches
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from api.constants import (CATALOG_CACHE_ALIAS, CATALOG_CACHE_SIZE,
+                           CATALOG_CACHE_TIMEOUT, RECIPE_CACHE_TIMEOUT)
+
+
+class CatalogCache:
+    """
+    Версионируемый кэш справочника.
+    Данные хранятся в локальном LRU процесса и в общем кэше Django,
+    версия справочника - в общем кэше, поэтому сброс виден всем процессам.
+    """
+
+    def __init__(self, name, maxsize=CATALOG_CACHE_SIZE):
+        self.name = name
+        self.maxsize = maxsize
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[CATALOG_CACHE_ALIAS]
+
+    @property
+    def version_key(self):
+        return f'{self.name}:version'
+
+    def version(self):
+        """Текущая версия справочника - время последнего изменения в мс."""
+        version = self.shared.get(self.version_key)
+        if version is None:
+            self.shared.add(self.version_key, int(time.time() * 1000),
+                            timeout=None)
+            version = self.shared.get(self.version_key)
+        return version
+
+    def invalidate(self):
+        """Сброс справочника во всех процессах."""
+        self.shared.set(self.version_key, int(time.time() * 1000),
+                        timeout=None)
+        with self._lock:
+            self._local.clear()
+
+    def get_or_set(self, version, key, default):
+        """Значение по ключу, при промахе вычисляется через default()."""
+        local_key = (version, key)
+        with self._lock:
+            if local_key in self._local:
+                self._local.move_to_end(local_key)
+                return self._local[local_key]
+        shared_key = f'{self.name}:{version}:{key}'
+        value = self.shared.get(shared_key)
+        if value is None:
+            value = default()
+            self.shared.set(shared_key, value, timeout=CATALOG_CACHE_TIMEOUT)
+        with self._lock:
+            self._local[local_key] = value
+            self._local.move_to_end(local_key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+        return value
+
+
+tags_cache = CatalogCache('tags')
+ingredients_cache = CatalogCache('ingredients')
+
+
+class RecipeCache:
+    """
+    Кэш представлений рецептов, не зависящих от пользователя.
+    У каждого рецепта своя версия, общая версия сбрасывает все рецепты
+    сразу. Представление записывается под версией, прочитанной до его
+    построения, поэтому устаревшие данные не переживут сброс.
+    Истёкшая версия создаётся заново с новым значением, поэтому версии
+    хранятся не дольше представлений.
+    """
+    GENERATION_KEY = 'recipe:generation'
+
+    @staticmethod
+    def version_key(pk):
+        return f'recipe:{pk}:version'
+
+    def versions(self, pk):
+        keys = (self.GENERATION_KEY, self.version_key(pk))
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                cache.add(key, time.time_ns(), timeout=RECIPE_CACHE_TIMEOUT)
+                versions[key] = cache.get(key)
+        return versions[self.GENERATION_KEY], versions[self.version_key(pk)]
+
+    def get_or_set(self, pk, prefix, default):
+        """Представление рецепта pk, при промахе строится через default()."""
+        generation, version = self.versions(pk)
+        key = f'recipe:{generation}:{pk}:{version}:{prefix}'
+        data = cache.get(key)
+        if data is None:
+            data = default()
+            cache.set(key, data, timeout=RECIPE_CACHE_TIMEOUT)
+        return data
+
+    def invalidate(self, *pks):
+        cache.set_many({self.version_key(pk): time.time_ns() for pk in pks},
+                       timeout=RECIPE_CACHE_TIMEOUT)
+
+    def invalidate_all(self):
+        cache.set(self.GENERATION_KEY, time.time_ns(),
+                  timeout=RECIPE_CACHE_TIMEOUT)
+
+
+recipe_cache = RecipeCache()
+
+
+class CatalogCacheMixin:
+    """Кэширование list/retrieve справочника с поддержкой ETag и 304."""
+    catalog = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, 'list', partial(super().list, request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, f'detail:{kwargs.get(self.lookup_field)}',
+            partial(super().retrieve, request, *args, **kwargs)
+        )
+
+    @staticmethod
+    def build_data(build):
+        """Данные ответа, отсутствие объекта тоже кэшируется."""
+        try:
+            return True, build().data
+        except Http404:
+            return False, None
+
+    def cached_response(self, request, name, build):
+        version = self.catalog.version()
+        key = f'{name}?{request.query_params.urlencode()}'
+        found, data = self.catalog.get_or_set(
+            version, key, partial(self.build_data, build)
+        )
+        if not found:
+            raise Http404
+        etag = quote_etag(
+            hashlib.md5(f'{version}:{key}'.encode()).hexdigest()
+        )
+        last_modified = version // 1000
+        not_modified = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -3,8 +3,33 @@ MAX_COOKING_TIME = 200
 MIN_AMOUNT_INGREDIENTS = 1
 MAX_AMOUNT_INGREDIENTS = 500
 PAGE_SIZE = 6
+RECIPES_LIMIT = 3
 TAG_NAME_LENGTH = 200
 TAG_COLOR_LENGTH = 7
 TAG_SLUG_LENGTH = 200
 RECIPE_NAME_LENGTH = 200
+SEARCH_CONFIG = 'russian'
 WRONG_NAMES = {'me', 'Me', 'ME', 'set_password', 'subscriptions', 'subscribe'}
+CATALOG_CACHE_ALIAS = 'catalog'
+CATALOG_CACHE_SIZE = 256
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+TRENDING_HALF_LIFE_HOURS = 48
+TRENDING_WINDOW_HALF_LIVES = 10
+TRENDING_MIN_SCORE = 0.01
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_CART_WEIGHT = 0.5
+THUMBNAIL_SIZE = (300, 300)
+IMAGE_WORKERS = 2
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_PIXELS = 25_000_000
+IMAGE_SPOOL_SIZE = 1024 * 1024
+FEED_LENGTH = 1000
+FEED_BATCH_SIZE = 5000
+SHOPPING_LIST_BATCH_SIZE = 5000
+METRICS_SAMPLES = 1000
+METRICS_QUANTILES = (0.5, 0.95, 0.99)
+METRICS_PUBLISH_INTERVAL = 10
+METRICS_TIMEOUT = 5 * 60
+RECIPE_CACHE_TIMEOUT = 60 * 60
+TAG_BITS = 63
+RECIPES_BATCH_SIZE = 100
@@ -0,0 +1,91 @@
+import binascii
+import re
+import uuid
+from base64 import b64decode
+from tempfile import SpooledTemporaryFile
+
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+from api.constants import (IMAGE_SPOOL_SIZE, MAX_IMAGE_PIXELS,
+                           MAX_IMAGE_SIZE)
+
+BASE64_CHUNK_SIZE = 64 * 1024
+DATA_URI = re.compile(r'^data:image/[\w.+-]+;base64,')
+WHITESPACE = re.compile(r'\s+')
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+class StreamingImageField(serializers.ImageField):
+    """
+    Поле изображения: base64-строка или файл из multipart/form-data.
+    Base64 декодируется частями во временный файл, размер и разрешение
+    проверяются по заголовку до полного декодирования изображения.
+    """
+    default_error_messages = {
+        'invalid_image': 'Загрузите корректное изображение.',
+        'max_size': 'Размер изображения не должен превышать '
+                    '{max_size} МБ.',
+        'max_pixels': 'Разрешение изображения не должно превышать '
+                      '{max_pixels} пикселей.',
+    }
+    EMPTY_VALUES = (None, '', [], (), {})
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if isinstance(data, UploadedFile):
+            self.check_size(data.size)
+            data.name = f'{uuid.uuid4()}.{self.check_image(data)}'
+            return data
+        if not isinstance(data, str):
+            self.fail('invalid_image')
+        file = self.decode(data)
+        return File(file, name=f'{uuid.uuid4()}.{self.check_image(file)}')
+
+    def check_size(self, size):
+        if size > MAX_IMAGE_SIZE:
+            self.fail('max_size', max_size=MAX_IMAGE_SIZE // (1024 * 1024))
+
+    def decode(self, data):
+        header = DATA_URI.match(data)
+        start = header.end() if header else 0
+        self.check_size((len(data) - start) * 3 // 4)
+        file = SpooledTemporaryFile(max_size=IMAGE_SPOOL_SIZE)
+        # Переносы строк (MIME) удаляются в каждой части, а неполная
+        # группа base64 переходит в следующую часть.
+        pending = ''
+        try:
+            for position in range(start, len(data), BASE64_CHUNK_SIZE):
+                pending += WHITESPACE.sub(
+                    '', data[position:position + BASE64_CHUNK_SIZE]
+                )
+                size = len(pending) - len(pending) % 4
+                file.write(b64decode(pending[:size]))
+                pending = pending[size:]
+            if pending:
+                raise ValueError('Неполная группа base64.')
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_image')
+        file.seek(0)
+        return file
+
+    def check_image(self, file):
+        """Проверка формата и разрешения без декодирования пикселей."""
+        try:
+            image = Image.open(file)
+            if image.format not in IMAGE_FORMATS:
+                self.fail('invalid_image')
+            width, height = image.size
+            if width * height > MAX_IMAGE_PIXELS:
+                self.fail('max_pixels', max_pixels=MAX_IMAGE_PIXELS)
+            image.verify()
+        except serializers.ValidationError:
+            raise
+        except Exception:
+            self.fail('invalid_image')
+        file.seek(0)
+        return IMAGE_FORMATS[image.format]
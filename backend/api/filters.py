@@ -1,7 +1,8 @@
 from django_filters import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
-from recipes.models import Ingredient, Recipe, Tag
+from api.search import ingredient_index
+from recipes.models import Recipe, Tag
 from users.models import User
 
 
@@ -9,17 +10,27 @@ class RecipeFilterSet(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         queryset=Tag.objects.all(),
-        to_field_name='slug'
+        to_field_name='slug',
+        method='get_tags',
     )
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
     is_favorited = filters.NumberFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'Популярные'), ('trending', 'В тренде')),
+        method='get_ordering',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ordering')
+
+    def get_tags(self, queryset, name, value):
+        return queryset.with_tags(value) if value else queryset
 
     def get_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -37,10 +48,23 @@ class RecipeFilterSet(FilterSet):
             )
         return queryset
 
+    def get_search(self, queryset, name, value):
+        return queryset.search(value)
+
+    def get_ordering(self, queryset, name, value):
+        if value == 'popular':
+            return queryset.order_by('-favorites_count', '-pub_date')
+        return queryset.filter(trend__isnull=False).order_by(
+            '-trend__score', '-trend__recipe_id'
+        )
 
-class IngredientFilter(SearchFilter):
+
+class IngredientFilter(BaseFilterBackend):
+    """Поиск ингредиентов по индексу в памяти."""
     search_param = 'name'
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '')
+        if not name or view.action != 'list':
+            return queryset
+        return ingredient_index.search(name)
@@ -0,0 +1,48 @@
+import random
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.management import BaseCommand
+
+from api.search import ingredient_index
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    """
+    Сравнение скорости поиска ингредиентов по индексу и через БД.
+    Выполнить - python manage.py bench_ingredient_search.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=500,
+                            help='Количество поисковых запросов.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stderr.write('Нет ингредиентов, выполните db_import.')
+            return
+        rng = random.Random(options['seed'])
+        queries = [
+            name[:rng.randint(1, 4)]
+            for name in rng.choices(names, k=options['queries'])
+        ]
+        ingredient_index.refresh()
+        self.report('БД (istartswith)', queries, lambda query: list(
+            Ingredient.objects.filter(name__istartswith=query)
+        ))
+        self.report('Индекс', queries, ingredient_index.search)
+
+    def report(self, title, queries, search):
+        timings = []
+        for query in queries:
+            start = perf_counter()
+            search(query)
+            timings.append((perf_counter() - start) * 1000)
+        percentiles = quantiles(timings, n=100)
+        self.stdout.write(
+            f'{title}: среднее {mean(timings):.3f} мс, '
+            f'p50 {percentiles[49]:.3f} мс, p95 {percentiles[94]:.3f} мс'
+        )
@@ -0,0 +1,63 @@
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.management import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import FastJSONRenderer
+from api.representations import (RECIPE_SHORT_FIELDS, USER_FIELDS,
+                                 recipe_short_data, user_data)
+from api.serializers import RecipeSubscriptionSerializer, UserReadSerializer
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Сравнение сериализаторов DRF с JSONRenderer и быстрого пути
+    из api.representations с FastJSONRenderer на страницах списков.
+    Выполнить - python manage.py bench_serialization.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100,
+                            help='Объектов на странице.')
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get('/api/recipes/')
+        request.user = User.objects.order_by('pk').first()
+        if request.user is None:
+            self.stderr.write('Нет данных, выполните generate_data.')
+            return
+        size = options['size']
+        recipes = list(Recipe.objects.values(*RECIPE_SHORT_FIELDS)[:size])
+        users = list(User.objects.values(*USER_FIELDS)[:size])
+        recipe_objects = list(Recipe.objects.only(*RECIPE_SHORT_FIELDS)[:size])
+        user_objects = list(User.objects.only(*USER_FIELDS)[:size])
+        context = {'request': request}
+        for title, slow, fast in (
+            ('Рецепты', lambda: RecipeSubscriptionSerializer(
+                recipe_objects, many=True, context=context
+            ).data, lambda: recipe_short_data(recipes, request)),
+            ('Пользователи', lambda: UserReadSerializer(
+                user_objects, many=True, context=context
+            ).data, lambda: user_data(users, request)),
+        ):
+            self.report(f'{title}, DRF', options['repeat'],
+                        lambda: JSONRenderer().render(slow()))
+            self.report(f'{title}, быстрый путь', options['repeat'],
+                        lambda: FastJSONRenderer().render(fast()))
+
+    def report(self, title, repeat, render):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            render()
+            timings.append((perf_counter() - start) * 1000)
+        percentiles = quantiles(timings, n=100)
+        self.stdout.write(
+            f'{title}: среднее {mean(timings):.3f} мс, '
+            f'p50 {percentiles[49]:.3f} мс, p95 {percentiles[94]:.3f} мс'
+        )
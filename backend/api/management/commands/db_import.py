@@ -1,28 +1,205 @@
+import json
 import os
+import re
+from contextlib import nullcontext
 from csv import reader
+from itertools import islice
+from time import perf_counter
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
 
-from recipes.models import Ingredient
+from api.cache import ingredients_cache, tags_cache
+from recipes.models import Ingredient, Tag
 
 DATA_PATH = os.path.join(settings.BASE_DIR, 'data')
 INGREDIENTS_DATA = os.path.join(DATA_PATH, 'ingredients.csv')
+TAGS_DATA = os.path.join(DATA_PATH, 'tags.json')
+BATCH_SIZE = 5000
+JSON_CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'[\s,]*')
+
+
+def new_tags(tags):
+    """Только новые тэги, каждому - свой бит маски."""
+    tags = list(tags)
+    existing = set(Tag.objects.filter(
+        slug__in=[tag.slug for tag in tags]
+    ).values_list('slug', flat=True))
+    created = []
+    for tag in tags:
+        if tag.slug not in existing:
+            existing.add(tag.slug)
+            created.append(tag)
+    for tag, bit in zip(created, Tag.free_bits(len(created))):
+        tag.bit = bit
+    return created
+
+
+MODELS = {
+    'ingredient': {
+        'model': Ingredient,
+        'fields': ('name', 'measurement_unit'),
+        'unique_field': None,
+        'path': INGREDIENTS_DATA,
+        'cache': ingredients_cache,
+        'prepare': list,
+    },
+    'tag': {
+        'model': Tag,
+        'fields': ('name', 'color', 'slug'),
+        'unique_field': 'slug',
+        'path': TAGS_DATA,
+        'cache': tags_cache,
+        'prepare': new_tags,
+    },
+}
+
+
+def read_csv(file, fields):
+    for row in reader(file):
+        if len(row) == len(fields):
+            yield dict(zip(fields, row))
+
+
+def read_json_lines(file, fields):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_json(file, fields):
+    """Потоковый разбор JSON-массива объектов без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив объектов.')
+    position = 1
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            obj, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON.')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield obj
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+    '.jsonl': read_json_lines,
+}
 
 
 class Command(BaseCommand):
     """
-    Импорт данных из .csv в базу.
+    Импорт данных из .csv, .json или .jsonl в базу.
+    Файл читается потоково, строки пишутся пакетами, уже существующие
+    записи пропускаются (а для тэгов - обновляются), поэтому повторный
+    запуск безопасен.
     Выполнить импорт - python manage.py db_import.
     """
 
-    def handle(self, *args, **kwargs):
-        with open(INGREDIENTS_DATA, 'r', encoding='UTF-8') as ingredients:
-            for fields in reader(ingredients):
-                if len(fields) == 2:
-                    name, measurement_unit = fields
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit,
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=MODELS, default='ingredient',
+                            help='Модель для импорта.')
+        parser.add_argument('--path', help='Путь к файлу с данными.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Количество строк в одной транзакции.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Проверить импорт без сохранения.')
+
+    def handle(self, *args, **options):
+        spec = MODELS[options['model']]
+        path = options['path'] or spec['path']
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in READERS:
+            raise CommandError(f'Неподдерживаемый формат файла: {path}')
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        model = spec['model']
+        start = perf_counter()
+        total = conflicts = 0
+        with transaction.atomic() if options['dry_run'] else nullcontext():
+            count_before = model.objects.count()
+            with open(path, 'r', encoding='UTF-8') as file:
+                rows = (
+                    row for row in READERS[extension](file, spec['fields'])
+                    if all(row.get(field) for field in spec['fields'])
+                )
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    try:
+                        with transaction.atomic():
+                            self.save_batch(spec, batch)
+                    except ValidationError as error:
+                        raise CommandError(error.messages[0])
+                    except IntegrityError:
+                        conflicts += self.save_rows(spec, batch)
+                    total += len(batch)
+                    elapsed = perf_counter() - start
+                    self.stdout.write(
+                        f'Обработано строк: {total} '
+                        f'({total / elapsed:.0f} строк/с)'
                     )
-        self.stdout.write('Импорт выполнен')
+            created = model.objects.count() - count_before
+            if options['dry_run']:
+                transaction.set_rollback(True)
+        elapsed = perf_counter() - start
+        if not options['dry_run']:
+            spec['cache'].invalidate()
+        self.stdout.write(
+            f'Импорт {"проверен" if options["dry_run"] else "выполнен"}: '
+            f'строк - {total}, новых записей - {created}, '
+            f'конфликтов - {conflicts}, '
+            f'{elapsed:.2f} с ({total / max(elapsed, 1e-9):.0f} строк/с)'
+        )
+
+    def save_rows(self, spec, batch):
+        """
+        Пакет с нарушением уникальности сохраняется построчно,
+        конфликтующие строки выводятся и пропускаются.
+        """
+        conflicts = 0
+        for row in batch:
+            try:
+                with transaction.atomic():
+                    self.save_batch(spec, [row])
+            except IntegrityError as error:
+                conflicts += 1
+                self.stderr.write(f'Конфликт, строка пропущена: {row} '
+                                  f'({error})')
+        return conflicts
+
+    @staticmethod
+    def save_batch(spec, batch):
+        model = spec['model']
+        fields = spec['fields']
+        model.objects.bulk_create(
+            spec['prepare'](model(**{field: row[field] for field in fields})
+                            for row in batch),
+            ignore_conflicts=True,
+        )
+        unique_field = spec['unique_field']
+        if not unique_field:
+            return
+        rows = {row[unique_field]: row for row in batch}
+        changed = []
+        for obj in model.objects.filter(**{f'{unique_field}__in': rows}):
+            row = rows[getattr(obj, unique_field)]
+            if any(getattr(obj, field) != row[field] for field in fields):
+                for field in fields:
+                    setattr(obj, field, row[field])
+                changed.append(obj)
+        model.objects.bulk_update(changed, fields)
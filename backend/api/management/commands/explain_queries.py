@@ -0,0 +1,157 @@
+import re
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.query_report import DEFAULT_URLS
+from api.search import ingredient_index
+from recipes.models import Recipe, Tag
+from users.models import User
+
+SEQ_SCAN_ROWS = 1000
+AUDIT_URLS = DEFAULT_URLS + (
+    '/api/recipes/?author={author}',
+    '/api/recipes/?tags={tag}',
+    '/api/recipes/?is_favorited=1',
+    '/api/recipes/?is_in_shopping_cart=1',
+    '/api/recipes/?ordering=popular',
+    '/api/recipes/?ordering=trending',
+    '/api/recipes/download_shopping_cart/',
+)
+# Чтение таблицы или индекса целиком, в том числе покрывающего.
+SQLITE_SCAN = re.compile(
+    r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?'
+    r'(?: USING (COVERING )?(INDEX) \w+)?$'
+)
+PG_SCANS = ('Seq Scan', 'Index Scan', 'Index Only Scan')
+SQL_ALIAS = re.compile(r'"(\w+)" (U\d+)\b')
+SQL_LIMIT = re.compile(r'\bLIMIT \d+\s*$')
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+class Command(BaseCommand):
+    """
+    Проверка планов SQL-запросов, которые выполняют представления API.
+    Запросы выполняются внутри процесса, для каждого SELECT в PostgreSQL
+    выполняется EXPLAIN (ANALYZE, BUFFERS), в SQLite - EXPLAIN QUERY
+    PLAN. Последовательное чтение больше --max-seq-rows строк - ошибка,
+    полное чтение индекса (без условия по индексу) тоже считается
+    последовательным.
+    Подсчёт COUNT(*) для пагинации читает всю выборку при любых
+    индексах, поэтому только выводится. SQLite не сообщает число строк,
+    за него принимается размер таблицы, если чтение не ограничено LIMIT.
+    Индекс поиска ингредиентов намеренно читает справочник целиком,
+    поэтому строится до проверки и в неё не попадает.
+    Запускать на заполненной базе (generate_data).
+    Выполнить - python manage.py explain_queries --email user@example.com.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Адрес для проверки, можно несколько.')
+        parser.add_argument('--email',
+                            help='Выполнять запросы от имени пользователя.')
+        parser.add_argument('--max-seq-rows', type=int,
+                            default=SEQ_SCAN_ROWS,
+                            help='Допустимое число строк, прочитанных '
+                                 'последовательно.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        client = Client()
+        if options['email']:
+            user = User.objects.filter(email=options['email']).first()
+            if user is None:
+                raise CommandError(
+                    f'Пользователь не найден: {options["email"]}'
+                )
+            token, _ = Token.objects.get_or_create(user=user)
+            client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        recipe = Recipe.objects.values('pk', 'author_id').first()
+        if recipe is None:
+            raise CommandError('Нет рецептов, выполните generate_data.')
+        values = {'recipe': recipe['pk'], 'author': recipe['author_id'],
+                  'tag': Tag.objects.values_list('slug', flat=True).first()}
+        ingredient_index.refresh()
+        self.stdout.write('Индекс поиска ингредиентов построен заранее: '
+                          'полное чтение справочника намеренное.')
+        self.table_rows = {}
+        failures = []
+        for url in options['urls'] or AUDIT_URLS:
+            url = url.format(**values)
+            with CaptureQueriesContext(connection) as queries:
+                client.get(url)
+            statements = dict.fromkeys(
+                query['sql'] for query in queries
+                if query['sql'].lstrip().upper().startswith('SELECT')
+            )
+            self.stdout.write(f'{url}: запросов - {len(queries)}')
+            for sql in statements:
+                count = sql.startswith('SELECT COUNT(*)')
+                for scan, table, rows in self.scans(sql):
+                    over = not count and rows > options['max_seq_rows']
+                    status = 'ОШИБКА' if over else 'COUNT' if count else 'ok'
+                    self.stdout.write(
+                        f'  {status:6} {scan} {table}: {rows} строк'
+                    )
+                    if over:
+                        failures.append(f'{url} ({table}, {rows})')
+        if failures:
+            raise CommandError(
+                'Последовательное чтение больших таблиц: '
+                f'{", ".join(failures)}'
+            )
+
+    def scans(self, sql):
+        """Полные чтения: вид чтения, таблица и число строк."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}'
+                )
+                scans = [
+                    (node['Node Type'], node['Relation Name'],
+                     (node['Actual Rows']
+                      + node.get('Rows Removed by Filter', 0))
+                     * node['Actual Loops'])
+                    for node in plan_nodes(cursor.fetchone()[0][0]['Plan'])
+                    if node['Node Type'] in PG_SCANS
+                    and 'Index Cond' not in node
+                ]
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                aliases = {alias: table
+                           for table, alias in SQL_ALIAS.findall(sql)}
+                details = [detail for *_, detail in cursor.fetchall()]
+                bounded = SQL_LIMIT.search(sql) and not any(
+                    'TEMP B-TREE' in detail for detail in details
+                )
+                scans = []
+                for detail in details:
+                    match = SQLITE_SCAN.match(detail)
+                    if match and not bounded:
+                        table = aliases.get(match[1], match[1])
+                        scans.append((
+                            'Index Only Scan' if match[2]
+                            else 'Index Scan' if match[3] else 'Seq Scan',
+                            table, self.count_rows(cursor, table),
+                        ))
+            transaction.set_rollback(True)
+        return scans
+
+    def count_rows(self, cursor, table):
+        """Размер таблицы - оценка строк при полном чтении в SQLite."""
+        if table not in self.table_rows:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+            )
+            self.table_rows[table] = cursor.fetchone()[0]
+        return self.table_rows[table]
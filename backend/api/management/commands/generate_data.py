@@ -0,0 +1,178 @@
+import random
+from io import StringIO
+from itertools import accumulate, islice
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+BATCH_SIZE = 5000
+PASSWORD = 'Load-test-password'
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+WORDS = ('суп', 'салат', 'пирог', 'рагу', 'каша', 'запеканка', 'паста',
+         'омлет', 'плов', 'борщ', 'блины', 'котлеты', 'соус', 'десерт')
+
+
+def batches(objects, size=BATCH_SIZE):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    """
+    Генерация синтетических данных для нагрузочного тестирования:
+    пользователи с токенами, рецепты, подписки, избранное и корзины.
+    Популярность авторов и рецептов распределена по закону Ципфа,
+    при одинаковом --seed данные совпадают. Повторный запуск с тем же
+    --prefix отклоняется, чтобы не добавить пользователям новые рецепты.
+    Выполнить - python manage.py generate_data --users 10000.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=3,
+                            help='Рецептов у каждого пользователя.')
+        parser.add_argument('--ingredients', type=int, default=6,
+                            help='Ингредиентов в каждом рецепте.')
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок у каждого пользователя.')
+        parser.add_argument('--favorites', type=int, default=30,
+                            help='Рецептов в избранном у пользователя.')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Рецептов в корзине у пользователя.')
+        parser.add_argument('--prefix', default='load',
+                            help='Префикс имён и email пользователей.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.start = perf_counter()
+        if not Ingredient.objects.exists():
+            call_command('db_import', stdout=StringIO())
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug, bit=bit)
+                for bit, (name, color, slug) in enumerate(TAGS)
+            )
+        prefix = options['prefix']
+        if Recipe.objects.filter(author__username__startswith=prefix).exists():
+            raise CommandError(
+                f'Данные с префиксом {prefix} уже созданы, '
+                'укажите другой --prefix.'
+            )
+        users = self.create_users(prefix, options['users'])
+        recipes = self.create_recipes(users, options['recipes'],
+                                      options['ingredients'])
+        self.create_relations(
+            Follow, 'author_id', users, users, options['follows']
+        )
+        self.create_relations(
+            Favorite, 'recipe_id', users, recipes, options['favorites']
+        )
+        self.create_relations(
+            ShoppingCart, 'recipe_id', users, recipes, options['carts']
+        )
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('trim_feed', '--rebuild', stdout=StringIO())
+        call_command('rebuild_shopping_lists', stdout=StringIO())
+        self.log('Счётчики, ленты и списки покупок пересчитаны')
+
+    def log(self, message):
+        self.stdout.write(f'{message} ({perf_counter() - self.start:.1f} с)')
+
+    def insert(self, model, objects, title=None):
+        """
+        Вставка пачками. ignore_conflicts не сообщает, сколько строк
+        пропущено, поэтому добавленные считаются по размеру таблицы.
+        """
+        before = model.objects.count()
+        total = 0
+        for batch in batches(objects):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        added = model.objects.count() - before
+        self.log(f'{title or model._meta.verbose_name_plural}: {added}'
+                 + (f', уже были - {total - added}' if total > added else ''))
+
+    def create_users(self, prefix, count):
+        password = make_password(PASSWORD)
+        self.insert(User, (
+            User(email=f'{prefix}{number}@foodgram.ru',
+                 username=f'{prefix}{number}', first_name='Имя',
+                 last_name='Фамилия', password=password)
+            for number in range(count)
+        ))
+        users = list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('pk', flat=True).order_by('pk'))
+        with_token = set(Token.objects.filter(
+            user_id__in=users
+        ).values_list('user_id', flat=True))
+        self.insert(Token, (Token(key=Token.generate_key(), user_id=user)
+                            for user in users if user not in with_token))
+        return users
+
+    def create_recipes(self, users, per_user, ingredients_count):
+        self.insert(Recipe, (
+            Recipe(author_id=author,
+                   name=f'{self.rng.choice(WORDS).capitalize()} {number}',
+                   text=' '.join(self.rng.choices(WORDS, k=30)),
+                   cooking_time=self.rng.randint(5, 180))
+            for author in users for number in range(per_user)
+        ))
+        recipes = list(Recipe.objects.filter(
+            author_id__in=users
+        ).values_list('pk', flat=True).order_by('pk'))
+        ingredients = list(Ingredient.objects.values_list('pk', flat=True))
+        tags = list(Tag.objects.values_list('pk', flat=True))
+        self.insert(IngredientAmount, (
+            IngredientAmount(recipe_id=recipe, ingredient_id=ingredient,
+                             amount=self.rng.randint(1, 500))
+            for recipe in recipes
+            for ingredient in self.rng.sample(
+                ingredients, min(ingredients_count, len(ingredients))
+            )
+        ), 'Ингредиенты рецептов')
+        self.insert(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in self.rng.sample(tags, self.rng.randint(1, len(tags)))
+        ), 'Тэги рецептов')
+        return recipes
+
+    def create_relations(self, model, target_field, users, targets, count):
+        """Связи пользователей с популярными по Ципфу объектами."""
+        if not targets:
+            return
+        weights = list(accumulate(1 / rank
+                                  for rank in range(1, len(targets) + 1)))
+        count = min(count, len(targets) - 1)
+
+        def relations():
+            for user in users:
+                chosen = set()
+                while len(chosen) < count:
+                    chosen.update(
+                        target for target in self.rng.choices(
+                            targets, cum_weights=weights, k=count
+                        ) if target != user or model is not Follow
+                    )
+                for target in islice(chosen, count):
+                    yield model(user_id=user, **{target_field: target})
+
+        self.insert(model, relations())
@@ -0,0 +1,246 @@
+import random
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from statistics import quantiles
+from time import perf_counter
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.core.management import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+
+DEFAULT_ENDPOINTS = (
+    '/api/recipes/',
+    '/api/recipes/?page=2',
+    '/api/tags/',
+    '/api/ingredients/?name=мол',
+)
+MIX = (
+    ('browse', 30),
+    ('favorites', 10),
+    ('feed', 10),
+    ('autocomplete', 25),
+    ('subscriptions', 10),
+    ('favorite', 10),
+    ('shopping_list', 5),
+)
+
+
+def endpoints_scenario(endpoints):
+    """Адреса по кругу."""
+    def scenario(worker):
+        return cycle((f'GET {path.split("?")[0]}', 'GET', path, None)
+                     for path in endpoints)
+    return scenario
+
+
+class MixScenario:
+    """
+    Смесь действий пользователя: просмотр рецептов с фильтром по тэгам,
+    избранное, лента подписок, автодополнение ингредиентов, подписки,
+    добавление в избранное и скачивание списка покупок.
+    Клиент добавляет и удаляет только рецепты, которых нет в избранном
+    и корзине его пользователя, поэтому данные generate_data не меняются.
+    """
+
+    def __init__(self, seed, user_ids):
+        self.seed = seed
+        self.user_ids = user_ids
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+        self.names = list(Ingredient.objects.values_list('name', flat=True))
+        recipes = list(Recipe.objects.values_list('pk', flat=True))
+        if not (self.tags and self.names and recipes):
+            raise CommandError('Нет данных, выполните generate_data.')
+        self.free = {}
+        for action, model in (('favorite', Favorite),
+                              ('shopping_cart', ShoppingCart)):
+            taken = defaultdict(set)
+            for user_id, recipe_id in model.objects.filter(
+                user_id__in=user_ids
+            ).values_list('user_id', 'recipe_id'):
+                taken[user_id].add(recipe_id)
+            for user_id in user_ids:
+                self.free[user_id, action] = [
+                    pk for pk in recipes if pk not in taken[user_id]
+                ]
+        self.actions, self.weights = zip(*MIX)
+
+    def __call__(self, worker):
+        rng = random.Random(self.seed + worker)
+        user_id = self.user_ids[worker]
+        while True:
+            action = rng.choices(self.actions, self.weights)[0]
+            yield from getattr(self, action)(rng, user_id)
+
+    def browse(self, rng, user_id):
+        tags = rng.sample(self.tags, rng.randint(1, len(self.tags)))
+        query = '&'.join(f'tags={tag}' for tag in tags)
+        yield ('GET /api/recipes/?tags=', 'GET',
+               f'/api/recipes/?{query}&page={rng.randint(1, 5)}', None)
+
+    def favorites(self, rng, user_id):
+        yield ('GET /api/recipes/?is_favorited=1', 'GET',
+               '/api/recipes/?is_favorited=1', None)
+
+    def feed(self, rng, user_id):
+        yield 'GET /api/recipes/feed/', 'GET', '/api/recipes/feed/', None
+
+    def autocomplete(self, rng, user_id):
+        """Запрос на каждую набранную букву названия."""
+        name = rng.choice(self.names)
+        for length in range(1, min(len(name), 4) + 1):
+            yield ('GET /api/ingredients/?name=', 'GET',
+                   f'/api/ingredients/?name={name[:length]}', None)
+
+    def subscriptions(self, rng, user_id):
+        yield ('GET /api/users/subscriptions/', 'GET',
+               '/api/users/subscriptions/?recipes_limit=3', None)
+
+    def favorite(self, rng, user_id):
+        recipe = rng.choice(self.free[user_id, 'favorite'])
+        path = f'/api/recipes/{recipe}/favorite/'
+        yield 'POST /api/recipes/{id}/favorite/', 'POST', path, None
+        yield 'DELETE /api/recipes/{id}/favorite/', 'DELETE', path, None
+
+    def shopping_list(self, rng, user_id):
+        recipe = rng.choice(self.free[user_id, 'shopping_cart'])
+        path = f'/api/recipes/{recipe}/shopping_cart/'
+        yield 'POST /api/recipes/{id}/shopping_cart/', 'POST', path, None
+        yield ('GET /api/recipes/download_shopping_cart/', 'GET',
+               '/api/recipes/download_shopping_cart/?format=txt', None)
+        yield 'DELETE /api/recipes/{id}/shopping_cart/', 'DELETE', path, None
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный тест запущенного сервера: пропускная способность
+    и задержки p50/p95/p99 по каждому адресу.
+    Ответы 4xx выводятся отдельно от успешных, 5xx и сетевые сбои -
+    ошибки.
+    Сценарий mix воспроизводит действия пользователей из generate_data,
+    каждый клиент работает под своим токеном.
+    Для сравнения WSGI и ASGI запустить сервер с SERVER_MODE=wsgi
+    и SERVER_MODE=asgi при одинаковом GUNICORN_WORKERS.
+    Выполнить - python manage.py load_test --base-url http://127.0.0.1:8000.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help='Количество одновременных клиентов.')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Длительность теста в секундах.')
+        parser.add_argument('--token', help='Токен авторизации.')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Адрес для проверки, можно несколько.')
+        parser.add_argument('--scenario', choices=('endpoints', 'mix'),
+                            default='endpoints')
+        parser.add_argument('--users-prefix', default='load',
+                            help='Префикс пользователей generate_data '
+                                 'для сценария mix.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['scenario'] == 'mix':
+            users = list(Token.objects.filter(
+                user__username__startswith=options['users_prefix']
+            ).order_by('user_id').values_list('user_id', 'key')[
+                :options['concurrency']
+            ])
+            if len(users) < options['concurrency']:
+                raise CommandError(
+                    f'Пользователей {options["users_prefix"]}* меньше, '
+                    'чем клиентов, выполните generate_data или '
+                    'уменьшите --concurrency.'
+                )
+            user_ids, tokens = zip(*users)
+            scenario = MixScenario(options['seed'], user_ids)
+        else:
+            scenario = endpoints_scenario(
+                options['endpoints'] or DEFAULT_ENDPOINTS
+            )
+            tokens = [options['token']] if options['token'] else []
+        results = self.run(
+            options['base_url'], scenario,
+            lambda worker: ({'Authorization': 'Token '
+                             f'{tokens[worker % len(tokens)]}'}
+                            if tokens else {}),
+            options['concurrency'], options['duration'],
+        )
+        self.report(results, options['duration'])
+
+    def run(self, base_url, scenario, headers, concurrency, duration):
+        """
+        Запуск concurrency клиентов на duration секунд.
+        scenario(номер клиента) возвращает итератор
+        (название, метод, путь, тело), headers(номер клиента) - заголовки.
+        """
+        results = defaultdict(
+            lambda: {'timings': [], 'client_errors': 0, 'errors': 0}
+        )
+        lock = threading.Lock()
+        deadline = perf_counter() + duration
+
+        def client(worker):
+            worker_headers = headers(worker)
+            for name, method, path, body in scenario(worker):
+                if perf_counter() >= deadline:
+                    return
+                start = perf_counter()
+                status = self.request(base_url + quote(path, safe='/?=&'),
+                                      method, body, worker_headers)
+                elapsed = (perf_counter() - start) * 1000
+                with lock:
+                    result = results[name]
+                    result['timings'].append(elapsed)
+                    if status is None or status >= 500:
+                        result['errors'] += 1
+                    elif status >= 400:
+                        result['client_errors'] += 1
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(client, worker)
+                           for worker in range(concurrency)]:
+                future.result()
+        return results
+
+    @staticmethod
+    def request(url, method, body, headers):
+        """Код ответа, None - сервер недоступен."""
+        request = Request(url, data=body, method=method, headers={
+            'Content-Type': 'application/json', **headers
+        })
+        try:
+            with urlopen(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+        except URLError:
+            return None
+
+    def report(self, results, duration):
+        self.stdout.write(
+            f'{"Адрес":45} {"запросов":>9} {"4xx":>7} {"ошибок":>7} '
+            f'{"RPS":>8} '
+            f'{"p50, мс":>9} {"p95, мс":>9} {"p99, мс":>9}'
+        )
+        total = 0
+        for endpoint, result in sorted(results.items()):
+            timings = result['timings']
+            total += len(timings)
+            percentiles = (quantiles(timings, n=100) if len(timings) > 1
+                           else timings * 99)
+            self.stdout.write(
+                f'{endpoint:45} {len(timings):>9} '
+                f'{result["client_errors"]:>7} {result["errors"]:>7} '
+                f'{len(timings) / duration:>8.1f} '
+                f'{percentiles[49]:>9.1f} {percentiles[94]:>9.1f} '
+                f'{percentiles[98]:>9.1f}'
+            )
+        self.stdout.write(f'Всего: {total / duration:.1f} запросов/с')
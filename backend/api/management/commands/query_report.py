@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment
+from rest_framework.authtoken.models import Token
+
+from api.metrics import metrics
+from recipes.models import Recipe
+from users.models import User
+
+DEFAULT_URLS = (
+    '/api/recipes/',
+    '/api/recipes/?cursor=',
+    '/api/recipes/{recipe}/',
+    '/api/tags/',
+    '/api/ingredients/?name=а',
+    '/api/users/',
+    '/api/users/me/',
+    '/api/users/subscriptions/',
+    '/api/recipes/feed/',
+    '/api/recipes/shopping_list/',
+)
+
+
+class Command(BaseCommand):
+    """
+    Отчёт по количеству SQL-запросов, времени SQL, сериализации
+    и рендеринга и размеру ответа для каждого представления.
+    Запросы выполняются внутри процесса, сервер не нужен.
+    Выполнить - python manage.py query_report --email user@example.com.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Адрес для проверки, можно несколько.')
+        parser.add_argument('--email',
+                            help='Выполнять запросы от имени пользователя.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Количество повторов каждого запроса.')
+        parser.add_argument('--fail-on-budget', action='store_true',
+                            help='Завершиться с ошибкой, если превышен '
+                                 'QUERY_BUDGET.')
+
+    def handle(self, *args, **options):
+        if not settings.QUERY_METRICS:
+            raise CommandError(
+                'Метрики отключены, задайте QUERY_METRICS=True.'
+            )
+        setup_test_environment()
+        client = Client()
+        if options['email']:
+            user = User.objects.filter(email=options['email']).first()
+            if user is None:
+                raise CommandError(
+                    f'Пользователь не найден: {options["email"]}'
+                )
+            token, _ = Token.objects.get_or_create(user=user)
+            client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        recipe = Recipe.objects.values_list('pk', flat=True).first()
+        urls = [url.format(recipe=recipe)
+                for url in options['urls'] or DEFAULT_URLS
+                if recipe or '{recipe}' not in url]
+        metrics.reset()
+        for url in urls:
+            for _ in range(options['repeat']):
+                client.get(url)
+        over_budget = self.report(metrics.snapshot())
+        if over_budget and options['fail_on_budget']:
+            raise CommandError(
+                f'Превышен бюджет в {settings.QUERY_BUDGET} SQL-запросов: '
+                f'{", ".join(over_budget)}'
+            )
+
+    def report(self, snapshot):
+        self.stdout.write(
+            f'{"Представление":40} {"запросов":>8} {"SQL p50":>8} '
+            f'{"SQL p99":>8} {"SQL, мс":>8} {"сериал., мс":>11} '
+            f'{"рендер, мс":>10} {"всего, мс":>10} {"байт p50":>9}'
+        )
+        over_budget = []
+        for view, stats in sorted(snapshot.items()):
+            queries = stats['queries']['percentiles']
+            p95 = {name: stats[name]['percentiles'][1] * 1000
+                   for name in ('sql_seconds', 'serialize_seconds',
+                                'render_seconds', 'duration_seconds')}
+            self.stdout.write(
+                f'{view:40} {stats["count"]:>8} {queries[0]:>8.0f} '
+                f'{queries[-1]:>8.0f} {p95["sql_seconds"]:>8.1f} '
+                f'{p95["serialize_seconds"]:>11.1f} '
+                f'{p95["render_seconds"]:>10.1f} '
+                f'{p95["duration_seconds"]:>10.1f}'
+                f' {stats["response_bytes"]["percentiles"][0]:>9.0f}'
+            )
+            if stats['over_budget']:
+                over_budget.append(view)
+        self.stdout.write(
+            'Перцентили времени - p95, бюджет SQL-запросов - '
+            f'{settings.QUERY_BUDGET}'
+        )
+        return over_budget
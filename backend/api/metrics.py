@@ -0,0 +1,323 @@
+import logging
+import os
+import threading
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+from functools import wraps
+from statistics import quantiles
+from time import monotonic, perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import Http404, HttpResponse
+from rest_framework.serializers import ListSerializer, Serializer
+
+from api.constants import (METRICS_PUBLISH_INTERVAL, METRICS_QUANTILES,
+                           METRICS_SAMPLES, METRICS_TIMEOUT)
+
+logger = logging.getLogger(__name__)
+
+METRICS = {
+    'queries': 'Количество SQL-запросов за запрос.',
+    'sql_seconds': 'Суммарное время SQL-запросов, с.',
+    'serialize_seconds': 'Время вычисления data сериализаторов, с.',
+    'render_seconds': 'Время рендеринга ответа, с.',
+    'duration_seconds': 'Полное время обработки запроса, с.',
+    'response_bytes': 'Размер ответа, байт.',
+}
+
+
+def percentiles(samples):
+    """Значения METRICS_QUANTILES по выборке."""
+    if len(samples) < 2:
+        return [samples[0] if samples else 0] * len(METRICS_QUANTILES)
+    points = quantiles(samples, n=100, method='inclusive')
+    return [points[round(quantile * 100) - 1]
+            for quantile in METRICS_QUANTILES]
+
+
+class Metrics:
+    """
+    Метрики запросов по представлениям внутри процесса.
+    Для перцентилей хранятся последние METRICS_SAMPLES значений.
+    Каждый процесс раз в METRICS_PUBLISH_INTERVAL публикует свои значения
+    в общем кэше, collect() собирает их по всем процессам.
+    """
+    WORKERS_KEY = 'metrics:workers'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.published = None
+        self.reset()
+
+    @staticmethod
+    def worker_key(pid):
+        return f'metrics:worker:{pid}'
+
+    def reset(self):
+        with self.lock:
+            self.views = defaultdict(self.new_view)
+
+    @staticmethod
+    def new_view():
+        return {
+            'count': 0,
+            'over_budget': 0,
+            'sums': dict.fromkeys(METRICS, 0),
+            'counts': dict.fromkeys(METRICS, 0),
+            'samples': {name: deque(maxlen=METRICS_SAMPLES)
+                        for name in METRICS},
+        }
+
+    def record(self, view, over_budget, **values):
+        with self.lock:
+            stats = self.views[view]
+            stats['count'] += 1
+            stats['over_budget'] += over_budget
+            for name, value in values.items():
+                if value is not None:
+                    stats['sums'][name] += value
+                    stats['counts'][name] += 1
+                    stats['samples'][name].append(value)
+        if (self.published is None
+                or monotonic() - self.published > METRICS_PUBLISH_INTERVAL):
+            self.publish()
+
+    def raw(self):
+        """Накопленные значения процесса по представлениям."""
+        with self.lock:
+            return {view: (stats['count'], stats['over_budget'],
+                           dict(stats['sums']), dict(stats['counts']),
+                           {name: list(samples) for name, samples
+                            in stats['samples'].items()})
+                    for view, stats in self.views.items()}
+
+    def publish(self):
+        """
+        Значения процесса в общий кэш. Список процессов обновляется
+        без блокировки: потерянная при гонке запись восстановится
+        при следующей публикации.
+        """
+        self.published = monotonic()
+        pid = os.getpid()
+        cache.set(self.worker_key(pid), self.raw(), timeout=METRICS_TIMEOUT)
+        workers = cache.get(self.WORKERS_KEY) or set()
+        if pid not in workers:
+            cache.set(self.WORKERS_KEY, workers | {pid},
+                      timeout=METRICS_TIMEOUT)
+        else:
+            cache.touch(self.WORKERS_KEY, timeout=METRICS_TIMEOUT)
+
+    def collect(self):
+        """
+        Агрегаты по всем процессам: суммы складываются, перцентили
+        считаются по объединённым выборкам. Процесс, не публиковавший
+        значения дольше METRICS_TIMEOUT, выпадает из сборки.
+        """
+        self.publish()
+        workers = cache.get(self.WORKERS_KEY) or set()
+        found = cache.get_many([self.worker_key(pid) for pid in workers])
+        alive = {pid for pid in workers if self.worker_key(pid) in found}
+        if alive != workers:
+            cache.set(self.WORKERS_KEY, alive, timeout=METRICS_TIMEOUT)
+        views = defaultdict(
+            lambda: [0, 0, Counter(), Counter(), defaultdict(list)]
+        )
+        for raw in found.values():
+            for view, (count, over_budget, sums, counts,
+                       samples) in raw.items():
+                total = views[view]
+                total[0] += count
+                total[1] += over_budget
+                total[2].update(sums)
+                total[3].update(counts)
+                for name, values in samples.items():
+                    total[4][name].extend(values)
+        return self.aggregate(views)
+
+    def snapshot(self):
+        """Агрегаты процесса: количество, суммы и перцентили."""
+        return self.aggregate(self.raw())
+
+    @staticmethod
+    def aggregate(views):
+        return {
+            view: {
+                'count': count,
+                'over_budget': over_budget,
+                **{name: {'sum': sums.get(name, 0),
+                          'count': counts.get(name, 0),
+                          'percentiles': percentiles(samples.get(name, []))}
+                   for name in METRICS},
+            }
+            for view, (count, over_budget, sums, counts, samples)
+            in views.items()
+        }
+
+    def prometheus(self):
+        """Метрики всех процессов в текстовом формате Prometheus."""
+        snapshot = sorted(self.collect().items())
+        lines = []
+        for name, description in METRICS.items():
+            metric = f'foodgram_request_{name}'
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} summary')
+            for view, stats in snapshot:
+                label = f'view="{escape(view)}"'
+                for quantile, value in zip(METRICS_QUANTILES,
+                                           stats[name]['percentiles']):
+                    lines.append(
+                        f'{metric}{{{label},quantile="{quantile}"}} {value}'
+                    )
+                lines.append(f'{metric}_sum{{{label}}} {stats[name]["sum"]}')
+                lines.append(
+                    f'{metric}_count{{{label}}} {stats[name]["count"]}'
+                )
+        metric = 'foodgram_query_budget_exceeded_total'
+        lines.append(f'# HELP {metric} Запросы сверх бюджета SQL-запросов.')
+        lines.append(f'# TYPE {metric} counter')
+        for view, stats in snapshot:
+            lines.append(
+                f'{metric}{{view="{escape(view)}"}} {stats["over_budget"]}'
+            )
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+metrics = Metrics()
+
+
+class QueryCounter:
+    """Обёртка execute_wrapper: количество и время SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += perf_counter() - start
+
+
+class SerializeTimer:
+    """Время вычисления data сериализаторов за запрос."""
+
+    def __init__(self):
+        self.seconds = 0
+        self.depth = 0
+
+
+serialize_timer = ContextVar('serialize_timer', default=None)
+
+
+def timed_serialization(func):
+    """
+    Замер времени func как сериализации в текущем запросе.
+    Вложенные вызовы не учитываются повторно.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        timer = serialize_timer.get()
+        if timer is None:
+            return func(*args, **kwargs)
+        timer.depth += 1
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timer.depth -= 1
+            if not timer.depth:
+                timer.seconds += perf_counter() - start
+
+    wrapper.timed = True
+    return wrapper
+
+
+def instrument_serializers():
+    """Замер data у всех сериализаторов DRF, однократно."""
+    for serializer_class in (Serializer, ListSerializer):
+        data = serializer_class.data.fget
+        if not getattr(data, 'timed', False):
+            serializer_class.data = property(timed_serialization(data))
+
+
+class QueryMetricsMiddleware:
+    """
+    Сбор метрик по каждому запросу: количество и время SQL-запросов,
+    время сериализации и рендеринга, размер ответа. Работает без DEBUG,
+    включается настройкой QUERY_METRICS.
+    Запросы сверх QUERY_BUDGET попадают в лог и заголовок ответа.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_METRICS:
+            raise MiddlewareNotUsed
+        instrument_serializers()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        timer = SerializeTimer()
+        token = serialize_timer.set(timer)
+        start = perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                response = self.get_response(request)
+        finally:
+            serialize_timer.reset(token)
+        duration = perf_counter() - start
+        match = request.resolver_match
+        view = (f'{request.method} {match.view_name}' if match
+                else f'{request.method} <unresolved>')
+        over_budget = 0 < settings.QUERY_BUDGET < counter.count
+        if over_budget:
+            logger.warning('%s: %d SQL-запросов при бюджете %d',
+                           view, counter.count, settings.QUERY_BUDGET)
+            response['X-Query-Budget-Exceeded'] = str(counter.count)
+        metrics.record(
+            view, over_budget,
+            queries=counter.count,
+            sql_seconds=counter.seconds,
+            serialize_seconds=timer.seconds,
+            render_seconds=getattr(request, '_render_seconds', None),
+            duration_seconds=duration,
+            response_bytes=(None if response.streaming
+                            else len(response.content)),
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        """Замер времени рендеринга ответа DRF."""
+        start = perf_counter()
+
+        def rendered(response):
+            request._render_seconds = perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    """
+    Метрики для Prometheus, доступны только с METRICS_ALLOWED_IPS.
+    Ответ собирается по всем процессам, публикующим метрики в общий кэш
+    (CACHE_BACKEND), поэтому кэш должен быть общим для всех воркеров:
+    файловый на одной машине или Redis/Memcached для нескольких.
+    Значения процесса видны с задержкой до METRICS_PUBLISH_INTERVAL.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(metrics.prometheus(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
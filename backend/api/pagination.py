@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from api.constants import PAGE_SIZE
 
@@ -7,3 +15,125 @@ class PageLimitPagination(PageNumberPagination):
     """Пагинатор."""
     page_size_query_param = 'limit'
     page_size = PAGE_SIZE
+
+
+class RecipeCursorPagination(BasePagination):
+    """
+    Курсорный пагинатор по ключу (pub_date, id), от новых к старым.
+    Курсор - ключ крайней записи страницы и направление, следующая
+    страница читается условием по ключу через индекс, без OFFSET.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+    invalid_ordering_message = ('Курсор поддерживает только сортировку '
+                                'по дате публикации.')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        order_by = queryset.query.order_by
+        if order_by and tuple(order_by) != self.ordering:
+            raise ValidationError({'cursor': self.invalid_ordering_message})
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        size = self.get_page_size(request)
+        reverse, position = self.decode_cursor(request)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            pub_date, pk = position
+            before = (Q(pub_date__gt=pub_date)
+                      | Q(pub_date=pub_date, id__gt=pk))
+            after = Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+            queryset = queryset.filter(before if reverse else after)
+        if reverse:
+            queryset = queryset.reverse()
+        page = list(queryset[:size + 1])
+        has_more = len(page) > size
+        page = page[:size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = page
+        return page
+
+    def get_page_size(self, request):
+        limit = request.query_params.get(self.page_size_query_param, '')
+        return int(limit) if limit.isdigit() and int(limit) else (
+            self.page_size
+        )
+
+    def decode_cursor(self, request):
+        """Направление и ключ (pub_date, id) из курсора."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return False, None
+        try:
+            reverse, pub_date, pk = urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (DecodeError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None or reverse not in ('0', '1'):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse == '1', (pub_date, pk)
+
+    def encode_cursor(self, reverse, row):
+        """Ссылка на страницу после (или перед) записью row."""
+        if isinstance(row, dict):
+            pub_date, pk = row['pub_date'], row['id']
+        else:
+            pub_date, pk = row.pub_date, row.pk
+        cursor = urlsafe_b64encode(
+            f'{int(reverse)}|{pub_date.isoformat()}|{pk}'.encode()
+        ).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   cursor)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return replace_query_param(self.base_url,
+                                       self.cursor_query_param, '')
+        return self.encode_cursor(True, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class RecipePagination(PageLimitPagination):
+    """
+    Пагинатор рецептов.
+    По умолчанию постраничный, с параметром ?cursor= - курсорный,
+    без COUNT(*) и OFFSET.
+    """
+    cursor_query_param = RecipeCursorPagination.cursor_query_param
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = RecipeCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,26 @@
+import json
+
+from django.utils.datastructures import MultiValueDict
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """
+    multipart/form-data, в котором поле data содержит JSON,
+    а файлы (например, image) передаются отдельными частями без base64.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        if 'data' not in result.data:
+            return result
+        try:
+            data = json.loads(result.data['data'])
+        except ValueError as error:
+            raise ParseError(f'Некорректный JSON в поле data: {error}')
+        if not isinstance(data, dict):
+            raise ParseError('Поле data должно содержать JSON-объект.')
+        data.update(result.files.dict())
+        return DataAndFiles(data, MultiValueDict())
@@ -0,0 +1,141 @@
+import csv
+from abc import ABCMeta, abstractmethod
+from io import BytesIO
+
+import orjson
+from django.conf import settings
+from django.http import Http404
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+SHOPPING_LIST_TITLE = 'Список покупок:'
+PDF_FONT_NAME = 'ShoppingList'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON через orjson. Для словарей, списков, строк, целых чисел
+    и None вывод побайтно совпадает с JSONRenderer, даты и прочие
+    типы передаются кодировщику DRF.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (self.ensure_ascii or not self.compact or self.get_indent(
+                accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        return orjson.dumps(
+            data, default=self.encoder_class().default,
+            option=self.options,
+        ).replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+
+
+class FormatContentNegotiation(DefaultContentNegotiation):
+    """Выбор рендерера только по параметру ?format=."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        requested_format = format_suffix or request.query_params.get(
+            self.settings.URL_FORMAT_OVERRIDE
+        )
+        if not requested_format:
+            return renderers[0], renderers[0].media_type
+        for renderer in renderers:
+            if renderer.format == requested_format:
+                return renderer, renderer.media_type
+        raise Http404
+
+
+class ShoppingListRenderer(BaseRenderer, metaclass=ABCMeta):
+    """Базовый рендерер списка покупок."""
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Ответы с ошибками отдаются текстом."""
+        if not data:
+            return b''
+        return '\n'.join(
+            f'{key}: {value}' for key, value in data.items()
+        ).encode()
+
+    @abstractmethod
+    def stream(self, ingredients):
+        """Генератор частей файла из строк (название, ед. изм., кол-во)."""
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield f'{SHOPPING_LIST_TITLE}\n\n'
+        separator = ''
+        for name, measurement_unit, amount in ingredients:
+            yield f'{separator}{name} - {amount} {measurement_unit}'
+            separator = '\n'
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')
+        )
+        for name, measurement_unit, amount in ingredients:
+            yield writer.writerow((name, amount, measurement_unit))
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """
+    PDF собирается целиком, так как таблица ссылок пишется в конец файла,
+    наружу он отдаётся частями.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    chunk_size = 64 * 1024
+
+    def stream(self, ingredients):
+        if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_FONT)
+            )
+        buffer = BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        _, height = A4
+        pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+        position = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, position, SHOPPING_LIST_TITLE)
+        position -= PDF_LINE_HEIGHT
+        for name, measurement_unit, amount in ingredients:
+            position -= PDF_LINE_HEIGHT
+            if position < PDF_MARGIN:
+                pdf.showPage()
+                pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+                position = height - PDF_MARGIN
+            pdf.drawString(PDF_MARGIN, position,
+                           f'{name} - {amount} {measurement_unit}')
+        pdf.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(self.chunk_size), b'')
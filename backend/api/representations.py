@@ -0,0 +1,75 @@
+from django.core.files.storage import default_storage
+
+from api.metrics import timed_serialization
+from recipes.images import VARIANTS
+
+RECIPE_SHORT_FIELDS = ('id', 'name', 'image', 'image_variants',
+                       'cooking_time')
+USER_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+def image_url(name, request):
+    """Ссылка на файл так же, как в ImageField.to_representation."""
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def image_variant_urls(name, variants, request):
+    """Ссылки на уменьшенные копии фото, пока их нет - на оригинал."""
+    if not name:
+        return None
+    return {variant: image_url(variants.get(variant, name), request)
+            for variant in VARIANTS}
+
+
+@timed_serialization
+def recipe_short_data(rows, request):
+    """
+    Представление RecipeSubscriptionSerializer из строк .values()
+    без полей DRF, результат совпадает с сериализатором.
+    """
+    return [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'image': image_url(row['image'], request) if row['image']
+            else None,
+            'image_variants': image_variant_urls(
+                row['image'], row['image_variants'], request
+            ),
+            'cooking_time': row['cooking_time'],
+        }
+        for row in rows
+    ]
+
+
+def subscribed_authors(request):
+    """Авторы, на которых подписан пользователь, один раз за запрос."""
+    if not request or request.user.is_anonymous:
+        return frozenset()
+    subscriptions = getattr(request, 'subscribed_authors', None)
+    if subscriptions is None:
+        subscriptions = set(
+            request.user.follower.values_list(
+                'author_id', flat=True
+            ).order_by()
+        )
+        request.subscribed_authors = subscriptions
+    return subscriptions
+
+
+@timed_serialization
+def user_data(rows, request):
+    """Представление UserReadSerializer из строк .values()."""
+    subscriptions = subscribed_authors(request)
+    return [
+        {
+            'email': row['email'],
+            'id': row['id'],
+            'username': row['username'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'is_subscribed': row['id'] in subscriptions,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,68 @@
+import threading
+from bisect import bisect_left
+
+from api.cache import ingredients_cache
+from recipes.models import Ingredient
+
+
+def normalize(value):
+    """Приведение названия к виду для поиска."""
+    return value.strip().casefold()
+
+
+class IngredientIndex:
+    """
+    Индекс названий ингредиентов в памяти процесса.
+    Отсортированный массив нормализованных названий строится при первом
+    поиске и перестраивается при смене версии справочника ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = ([], [])
+
+    def build(self):
+        rows = sorted(
+            (normalize(name), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'
+            )
+        )
+        self._index = (
+            [row[0] for row in rows],
+            [
+                Ingredient(pk=pk, name=name,
+                           measurement_unit=measurement_unit)
+                for _, pk, name, measurement_unit in rows
+            ],
+        )
+
+    def refresh(self):
+        version = ingredients_cache.version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self.build()
+                    self._version = version
+
+    def search(self, query):
+        """
+        Ингредиенты, название которых начинается с query,
+        затем ингредиенты, в названии которых query встречается.
+        """
+        self.refresh()
+        query = normalize(query)
+        names, ingredients = self._index
+        start = end = bisect_left(names, query)
+        while end < len(names) and names[end].startswith(query):
+            end += 1
+        return ingredients[start:end] + [
+            ingredient
+            for index, (name, ingredient) in enumerate(zip(names,
+                                                           ingredients))
+            if (index < start or index >= end) and query in name
+        ]
+
+
+ingredient_index = IngredientIndex()
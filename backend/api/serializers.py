@@ -1,13 +1,19 @@
 from django.contrib.auth.password_validation import validate_password
 from django.core.validators import MinValueValidator
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
+from rest_framework.settings import api_settings
 
-from api.constants import MIN_AMOUNT_INGREDIENTS, MIN_COOKING_TIME, WRONG_NAMES
+from api.constants import (MIN_AMOUNT_INGREDIENTS, MIN_COOKING_TIME,
+                           RECIPES_BATCH_SIZE, WRONG_NAMES)
+from api.fields import StreamingImageField
+from api.representations import image_variant_urls, subscribed_authors
 from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.shopping_list import (amounts_diff,
+                                   change_recipe_in_shopping_lists)
 from users.models import User
 
 
@@ -46,7 +52,15 @@ class UserCreatingSerializer(UserCreateSerializer):
         return data
 
 
-class UserReadSerializer(UserSerializer):
+class SubscribedMixin:
+    """Проверка подписки по авторам, загруженным один раз за запрос."""
+
+    def get_is_subscribed(self, author):
+        """Проверка - подписан ли пользователь на автора."""
+        return author.pk in subscribed_authors(self.context.get('request'))
+
+
+class UserReadSerializer(SubscribedMixin, UserSerializer):
     """Сериализатор пользователя."""
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -57,13 +71,6 @@ class UserReadSerializer(UserSerializer):
             'is_subscribed'
         )
 
-    def get_is_subscribed(self, author):
-        """Проверка - подписан ли пользователь на автора."""
-        request = self.context.get('request')
-        if request and not request.user.is_anonymous:
-            return request.user.follower.filter(author=author).exists()
-        return False
-
 
 class ChangePasswordSerializer(serializers.Serializer):
     """Сериализатор для изменения пароля юзера."""
@@ -149,13 +156,19 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.BooleanField(read_only=True)
     is_in_shopping_cart = serializers.BooleanField(read_only=True)
     author = UserReadSerializer(read_only=True)
-    image = Base64ImageField()
+    image = StreamingImageField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'author', 'name', 'text', 'ingredients', 'tags',
-                  'cooking_time', 'image', 'is_in_shopping_cart',
-                  'is_favorited')
+                  'cooking_time', 'image', 'image_variants',
+                  'is_in_shopping_cart', 'is_favorited')
+
+    def get_image_variants(self, recipe):
+        """Ссылки на уменьшенные копии фото, пока их нет - на оригинал."""
+        return image_variant_urls(recipe.image.name, recipe.image_variants,
+                                  self.context.get('request'))
 
 
 class RecipeSubscriptionSerializer(RecipeSerializer):
@@ -163,18 +176,18 @@ class RecipeSubscriptionSerializer(RecipeSerializer):
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(SubscribedMixin, serializers.ModelSerializer):
     """Сериализатор подписок."""
 
     email = serializers.ReadOnlyField()
     username = serializers.ReadOnlyField()
     is_subscribed = serializers.SerializerMethodField()
-    recipes = RecipeSubscriptionSerializer(many=True, read_only=True)
-    recipes_count = serializers.IntegerField(source='recipes.count',
-                                             read_only=True)
+    recipes = RecipeSubscriptionSerializer(many=True, read_only=True,
+                                           source='latest_recipes')
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -194,36 +207,19 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             )
         return data
 
-    def get_is_subscribed(self, author):
-        """Проверка - подписан ли пользователь на автора."""
-        request_user = self.context.get('request').user
-        return (request_user.is_authenticated
-                and request_user.follower.filter(author=author).exists())
-
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(SubscribedMixin, serializers.ModelSerializer):
     """Авторы на которых подписан пользователь."""
     is_subscribed = serializers.SerializerMethodField()
-    recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='recipes.count',
-                                              read_only=True)
+    recipes = RecipeSubscriptionSerializer(many=True, read_only=True,
+                                           source='latest_recipes')
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name',
                   'last_name', 'is_subscribed', 'recipes', 'recipes_count')
 
-    def get_is_subscribed(self, obj):
-        """Проверка подписки пользователя на автора."""
-        user = self.context.get('request').user
-        return (user.is_authenticated
-                and user.follower.filter(author=obj).exists())
-
-    def get_recipes(self, obj):
-        recipes = obj.recipes.all()[:3]
-        serializer = RecipeSerializer(recipes, many=True, read_only=True)
-        return serializer.data
-
 
 class RecipeCreateSerializer(RecipeSerializer):
     """Сериализатор создания рецепта."""
@@ -245,16 +241,46 @@ class RecipeCreateSerializer(RecipeSerializer):
 
     @staticmethod
     def save_ingredients(recipe, ingredients):
-        for ingredient in ingredients:
-            current_ingredient = ingredient['ingredient']['id']
-            current_amount = ingredient.get('amount')
-            obj, created = IngredientAmount.objects.get_or_create(
+        """Сохраняет ингредиенты рецепта одним запросом."""
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
                 recipe=recipe,
-                ingredient=current_ingredient,
-                amount=current_amount
+                ingredient=ingredient['ingredient']['id'],
+                amount=ingredient['amount'],
             )
-        if created:
-            pass
+            for ingredient in ingredients
+        )
+
+    def update_ingredients(self, recipe, ingredients):
+        """Обновляет только изменившиеся ингредиенты рецепта."""
+        current = {
+            ingredient_amount.ingredient_id: ingredient_amount
+            for ingredient_amount in recipe.ingredients_amount.all()
+        }
+        old_amounts = {ingredient_id: ingredient_amount.amount
+                       for ingredient_id, ingredient_amount
+                       in current.items()}
+        new_ingredients = []
+        changed = []
+        for ingredient in ingredients:
+            ingredient_amount = current.pop(ingredient['ingredient']['id'].pk,
+                                            None)
+            if ingredient_amount is None:
+                new_ingredients.append(ingredient)
+            elif ingredient_amount.amount != ingredient['amount']:
+                ingredient_amount.amount = ingredient['amount']
+                changed.append(ingredient_amount)
+        if current:
+            IngredientAmount.objects.filter(
+                pk__in=[obj.pk for obj in current.values()]
+            ).delete()
+        IngredientAmount.objects.bulk_update(changed, ('amount',))
+        self.save_ingredients(recipe, new_ingredients)
+        change_recipe_in_shopping_lists(recipe.pk, amounts_diff(
+            old_amounts,
+            {ingredient['ingredient']['id'].pk: ingredient['amount']
+             for ingredient in ingredients},
+        ))
 
     def validate(self, data):
         cooking_time = []
@@ -283,6 +309,7 @@ class RecipeCreateSerializer(RecipeSerializer):
             )
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         ingredients = validated_data.pop('ingredients_amount')
@@ -295,60 +322,78 @@ class RecipeCreateSerializer(RecipeSerializer):
         self.save_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients_amount')
         tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.ingredients.clear()
-        instance.tags.set(*tags)
-        self.save_ingredients(instance, ingredients)
+        instance.tags.set(tags)
+        self.update_ingredients(instance, ingredients)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            (instance,),
+            Prefetch(
+                'ingredients_amount',
+                queryset=IngredientAmount.objects.select_related('ingredient'),
+            ),
+        )
         return RecipeSerializer(instance, context=self.context).data
 
 
-class FavoriteSerializer(RecipeSubscriptionSerializer):
+class UserRecipeSerializer(serializers.ModelSerializer):
+    """
+    Добавление рецепта в список пользователя. Пользователь и рецепт
+    передаются в save(), повтор отклоняет ограничение уникальности БД.
+    Другие ошибки целостности (удалённый рецепт, сбой в сигналах)
+    не выдаются за повтор.
+    """
+    conflict_message = None
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            if not self.Meta.model.objects.filter(**validated_data).exists():
+                raise
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [self.conflict_message]},
+                code='unique',
+            )
+
+
+class FavoriteSerializer(UserRecipeSerializer):
     """Сериализатор Избранного."""
-    user = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(),
-        write_only=True,
-    )
-    recipe = serializers.PrimaryKeyRelatedField(
-        queryset=Recipe.objects.all(),
-        write_only=True,
-    )
+    conflict_message = 'Рецепт уже добавлен в избранное'
 
     class Meta:
         model = Favorite
-        fields = ('user', 'recipe')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Favorite.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже добавлен в избранное'
-            )
-        ]
+        fields = ()
 
 
-class ShoppingCartSerializer(RecipeSubscriptionSerializer):
+class ShoppingCartSerializer(UserRecipeSerializer):
     """Сериализатор Корзины."""
-    user = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(),
-        write_only=True,
-    )
-    recipe = serializers.PrimaryKeyRelatedField(
-        queryset=Recipe.objects.all(),
-        write_only=True,
-    )
+    conflict_message = 'Рецепт уже в корзине'
 
     class Meta:
         model = ShoppingCart
-        fields = ('user', 'recipe')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=ShoppingCart.objects.all(),
-                fields=('user', 'recipe'),
-                message='Рецепт уже в корзине'
-            )
-        ]
+        fields = ()
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    """Сериализатор списка рецептов для пакетных операций."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=RECIPES_BATCH_SIZE,
+    )
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Сериализатор строки списка покупок."""
+    id = serializers.ReadOnlyField(source='ingredient_id')
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
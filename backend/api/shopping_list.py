@@ -0,0 +1,12 @@
+from recipes.models import ShoppingListItem
+
+
+def shopping_list(user):
+    """
+    Строки (название, ед. изм., кол-во) списка покупок пользователя.
+    Суммы поддерживаются в ShoppingListItem, чтение - проход
+    по индексу (user, name, measurement_unit).
+    """
+    return ShoppingListItem.objects.filter(user=user).values_list(
+        'name', 'measurement_unit', 'amount'
+    )
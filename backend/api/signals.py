@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.cache import ingredients_cache, recipe_cache, tags_cache
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from users.models import User
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    """
+    Сброс кэша тэгов после фиксации транзакции, иначе параллельный
+    запрос сохранит старые строки под новой версией.
+    """
+    transaction.on_commit(tags_cache.invalidate)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    """
+    Сброс кэша ингредиентов после фиксации транзакции,
+    вместе с ним перестраивается индекс поиска.
+    """
+    transaction.on_commit(ingredients_cache.invalidate)
+
+
+def invalidate_recipes(*pks):
+    """Сброс кэша рецептов после фиксации транзакции."""
+    transaction.on_commit(lambda: recipe_cache.invalidate(*pks))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    invalidate_recipes(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    invalidate_recipes(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, reverse, pk_set, **kwargs):
+    if kwargs['action'] not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_recipes(instance.pk)
+    elif pk_set:
+        invalidate_recipes(*pk_set)
+    else:
+        transaction.on_commit(recipe_cache.invalidate_all)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_all_recipes(sender, **kwargs):
+    """Названия тэгов и ингредиентов входят во все рецепты."""
+    transaction.on_commit(recipe_cache.invalidate_all)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(sender, instance, created, update_fields,
+                              **kwargs):
+    """Сброс рецептов автора при изменении его профиля."""
+    if created or (update_fields
+                   and not AUTHOR_FIELDS.intersection(update_fields)):
+        return
+    invalidate_recipes(*instance.recipes.values_list('pk', flat=True))
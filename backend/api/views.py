@@ -1,26 +1,47 @@
-from django.db.models import F, Sum
-from django.http import HttpResponse
+from functools import partial
+
+from django.db import transaction
+from django.db.models import (Exists, OuterRef, Prefetch,
+                              prefetch_related_objects)
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated, SAFE_METHODS
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 
+from .cache import (CatalogCacheMixin, ingredients_cache, recipe_cache,
+                    tags_cache)
+from .constants import RECIPES_LIMIT
 from .filters import IngredientFilter, RecipeFilterSet
+from .pagination import RecipePagination
+from .parsers import MultiPartJSONParser
 from .permissions import AdminOrReadOnly, AuthorOrAdminOrReadOnly
+from .renderers import (CSVShoppingListRenderer, FastJSONRenderer,
+                        FormatContentNegotiation, PDFShoppingListRenderer,
+                        TextShoppingListRenderer)
+from .representations import (RECIPE_SHORT_FIELDS, USER_FIELDS,
+                              recipe_short_data, user_data)
 from .serializers import (ChangePasswordSerializer, FavoriteSerializer,
                           FollowSerializer,
-                          IngredientSerializer, RecipeCreateSerializer,
+                          IngredientSerializer, RecipeBatchSerializer,
+                          RecipeCreateSerializer,
                           RecipeSerializer, RecipeSubscriptionSerializer,
-                          ShoppingCartSerializer, SubscriptionSerializer,
-                          TagSerializer, UserCreatingSerializer,
-                          UserReadSerializer)
-from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                            ShoppingCart, Tag)
+                          ShoppingCartSerializer, ShoppingListItemSerializer,
+                          SubscriptionSerializer, TagSerializer,
+                          UserCreatingSerializer, UserReadSerializer)
+from .shopping_list import shopping_list
+from recipes.batch import add_recipes, remove_recipes
+from recipes.models import (Favorite, FeedItem, Ingredient,
+                            IngredientAmount, Recipe, ShoppingCart, Tag)
 from users.models import Follow, User
 
+USER_FLAGS = ('is_favorited', 'is_in_shopping_cart', 'is_subscribed')
+
 
 class UsersViewSet(mixins.CreateModelMixin,
                    mixins.ListModelMixin,
@@ -29,6 +50,7 @@ class UsersViewSet(mixins.CreateModelMixin,
     """ViewSet для User."""
     queryset = User.objects.all()
     permission_classes = (AllowAny, )
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve', 'me'):
@@ -37,6 +59,13 @@ class UsersViewSet(mixins.CreateModelMixin,
             return ChangePasswordSerializer
         return UserCreatingSerializer
 
+    def list(self, request, *args, **kwargs):
+        """Список пользователей без полей DRF, как UserReadSerializer."""
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()).values(*USER_FIELDS)
+        )
+        return self.get_paginated_response(user_data(page, request))
+
     def get_permissions(self):
         if self.action == 'retrieve':
             self.permission_classes = [IsAuthenticated, ]
@@ -63,11 +92,25 @@ class UsersViewSet(mixins.CreateModelMixin,
         return Response({'detail': 'Пароль успешно изменен'},
                         status=status.HTTP_200_OK)
 
+    @staticmethod
+    def latest_recipes(request):
+        """Загрузка последних recipes_limit рецептов каждого автора."""
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        recipes_limit = (int(recipes_limit) if recipes_limit.isdigit()
+                         else RECIPES_LIMIT)
+        return Prefetch(
+            'recipes',
+            queryset=Recipe.objects.latest_per_author(recipes_limit),
+            to_attr='latest_recipes',
+        )
+
     @action(detail=False, methods=['GET'],
             permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
         """Список подписок пользователя."""
-        queryset = User.objects.filter(following__user=request.user)
+        queryset = User.objects.filter(
+            following__user=request.user
+        ).prefetch_related(self.latest_recipes(request))
         page = self.paginate_queryset(queryset)
         serializer = FollowSerializer(page, many=True,
                                       context={'request': request})
@@ -75,6 +118,7 @@ class UsersViewSet(mixins.CreateModelMixin,
 
     @action(detail=True, methods=['POST', 'DELETE'],
             permission_classes=(IsAuthenticated,))
+    @transaction.atomic
     def subscribe(self, request, pk):
         """Подписка/отписка текущего пользователя на/от автора."""
         author = get_object_or_404(User, id=pk)
@@ -84,6 +128,7 @@ class UsersViewSet(mixins.CreateModelMixin,
                                                          'author': author})
             serializer.is_valid(raise_exception=True)
             Follow.objects.create(user=request.user, author=author)
+            prefetch_related_objects([author], self.latest_recipes(request))
             return Response(serializer.data,
                             status=status.HTTP_201_CREATED)
         get_object_or_404(Follow, user=request.user,
@@ -92,23 +137,25 @@ class UsersViewSet(mixins.CreateModelMixin,
                         status=status.HTTP_204_NO_CONTENT)
 
 
-class TagsViewSet(mixins.ListModelMixin,
+class TagsViewSet(CatalogCacheMixin,
+                  mixins.ListModelMixin,
                   mixins.RetrieveModelMixin,
                   viewsets.GenericViewSet):
     """Вьюсет для тэгов."""
+    catalog = tags_cache
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AdminOrReadOnly,)
     pagination_class = None
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для ингредиентов."""
+    catalog = ingredients_cache
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AdminOrReadOnly,)
     pagination_class = None
-    search_fields = ('^name',)
     filter_backends = (IngredientFilter,)
 
 
@@ -117,11 +164,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (AuthorOrAdminOrReadOnly,)
+    pagination_class = RecipePagination
+    parser_classes = (JSONParser, MultiPartJSONParser)
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
     filter_backends = (DjangoFilterBackend,)
     filter_class = RecipeFilterSet
     filterset_class = RecipeFilterSet
 
     def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return RecipeSerializer
         if self.request.method in SAFE_METHODS:
             return RecipeSubscriptionSerializer
         return RecipeCreateSerializer
@@ -129,11 +181,111 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user_id = self.request.user.pk
         return Recipe.objects.add_annotations(user_id).select_related(
-            'author').prefetch_related('ingredients', 'tags')
+            'author').prefetch_related(
+            Prefetch('ingredients_amount',
+                     IngredientAmount.objects.select_related('ingredient')),
+            'tags').defer('search_vector')
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт из кэша с флагами текущего пользователя поверх."""
+        if request.query_params:
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            pk = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+        build = partial(super().retrieve, request, *args, **kwargs)
+        data = recipe_cache.get_or_set(
+            pk, request.build_absolute_uri('/'), lambda: build().data
+        )
+        return Response(self.add_user_flags(data))
+
+    def add_user_flags(self, data):
+        """Флаги избранного, корзины и подписки для текущего пользователя."""
+        user = self.request.user
+        author = data.get('author')
+        flags = dict.fromkeys(USER_FLAGS, False)
+        if user.is_authenticated and (
+                isinstance(author, dict) or flags.keys() & data.keys()):
+            flags = Recipe.objects.filter(pk=data['id']).add_annotations(
+                user.pk
+            ).annotate(
+                is_subscribed=Exists(Follow.objects.filter(
+                    user=user, author=OuterRef('author')
+                ))
+            ).values(*flags).get()
+        if isinstance(author, dict):
+            author['is_subscribed'] = flags.pop('is_subscribed')
+        data.update({flag: value for flag, value in flags.items()
+                     if flag in data})
+        return data
+
+    @action(detail=False, methods=['GET'],
+            permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь."""
+        page = self.paginate_queryset(
+            FeedItem.objects.filter(user=request.user).only(
+                'recipe_id', 'pub_date'
+            )
+        )
+        recipes = {
+            row['id']: row for row in self.short_rows(
+                self.get_queryset().filter(
+                    pk__in=[item.recipe_id for item in page]
+                )
+            )
+        }
+        return self.get_paginated_response(recipe_short_data(
+            [recipes[item.recipe_id] for item in page
+             if item.recipe_id in recipes],
+            request,
+        ))
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов без полей DRF, как RecipeSubscriptionSerializer."""
+        page = self.paginate_queryset(
+            self.short_rows(self.filter_queryset(self.get_queryset()))
+        )
+        return self.get_paginated_response(recipe_short_data(page, request))
+
+    @staticmethod
+    def short_rows(queryset):
+        return queryset.prefetch_related(None).values(
+            *RECIPE_SHORT_FIELDS, 'pub_date'
+        )
+
 
+class RecipeBatchMixin:
+    """Пакетное добавление и удаление рецептов из списка пользователя."""
+    batch_model = None
 
-class FavoriteRecipeViewSet(viewsets.ViewSet):
+    @transaction.atomic
+    def change_batch(self, request, change):
+        """Изменение списка по id из тела запроса, результат для каждого."""
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = change(self.batch_model, request.user.pk,
+                         serializer.validated_data['recipes'])
+        return Response([{'id': pk, 'status': result}
+                         for pk, result in results.items()])
+
+
+class FavoriteRecipeViewSet(RecipeBatchMixin, viewsets.ViewSet):
     """Вьюсет для избранных рецептов."""
+    batch_model = Favorite
+
+    @action(detail=False, methods=['POST'], url_path='favorite/batch',
+            permission_classes=(IsAuthenticated,))
+    def favorite_batch(self, request):
+        """Добавляет список рецептов в избранное."""
+        return self.change_batch(request, add_recipes)
+
+    @favorite_batch.mapping.delete
+    def delete_favorite_batch(self, request):
+        """Удаляет список рецептов из избранного."""
+        return self.change_batch(request, remove_recipes)
+
     @action(
         detail=True,
         methods=['POST'],
@@ -141,13 +293,9 @@ class FavoriteRecipeViewSet(viewsets.ViewSet):
     def favorite(self, request, pk):
         """Добавляет рецепт в избранное."""
         recipe = get_object_or_404(Recipe, pk=pk)
-        data = {
-            'user': request.user.pk,
-            'recipe': recipe.pk
-        }
-        serializer = FavoriteSerializer(data=data)
+        serializer = FavoriteSerializer(data={})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer.save(user=request.user, recipe=recipe)
         serializer = RecipeSubscriptionSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -161,8 +309,21 @@ class FavoriteRecipeViewSet(viewsets.ViewSet):
         return Response(message, status=status.HTTP_204_NO_CONTENT)
 
 
-class ShoppingCartViewSet(viewsets.ViewSet):
+class ShoppingCartViewSet(RecipeBatchMixin, viewsets.ViewSet):
     """Вьюсет для корзины покупок."""
+    batch_model = ShoppingCart
+
+    @action(detail=False, methods=['POST'], url_path='shopping_cart/batch',
+            permission_classes=(IsAuthenticated,))
+    def shopping_cart_batch(self, request):
+        """Добавляет список рецептов в корзину."""
+        return self.change_batch(request, add_recipes)
+
+    @shopping_cart_batch.mapping.delete
+    def delete_shopping_cart_batch(self, request):
+        """Удаляет список рецептов из корзины."""
+        return self.change_batch(request, remove_recipes)
+
     @action(
         detail=True,
         methods=['POST'],
@@ -170,13 +331,9 @@ class ShoppingCartViewSet(viewsets.ViewSet):
     def shopping_cart(self, request, pk):
         """Добавляет рецепт в корзину."""
         recipe = get_object_or_404(Recipe, pk=pk)
-        data = {
-            'user': request.user.pk,
-            'recipe': recipe.pk
-        }
-        serializer = ShoppingCartSerializer(data=data)
+        serializer = ShoppingCartSerializer(data={})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer.save(user=request.user, recipe=recipe)
         serializer = RecipeSubscriptionSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -191,29 +348,37 @@ class ShoppingCartViewSet(viewsets.ViewSet):
 
 
 class DownloadShoppingCartViewSet(viewsets.ViewSet):
-    """Вьюсет для загрузки файла с корзиной покупок."""
+    """Вьюсет списка покупок: JSON и загрузка файла."""
+
+    @action(detail=False, methods=['GET'],
+            permission_classes=(IsAuthenticated,))
+    def shopping_list(self, request):
+        """Список покупок: суммы ингредиентов рецептов в корзине."""
+        serializer = ShoppingListItemSerializer(
+            request.user.shopping_list.all(), many=True
+        )
+        return Response(serializer.data)
+
     @action(
         detail=False,
         methods=['GET'],
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=(TextShoppingListRenderer, CSVShoppingListRenderer,
+                          PDFShoppingListRenderer),
+        content_negotiation_class=FormatContentNegotiation,
     )
     def download_shopping_cart(self, request):
-        """Загрузка файла с корзины."""
-        ingredients = IngredientAmount.objects.filter(
-            recipe__shopping_cart__user=request.user).values(
-            name=F('ingredient__name'),
-            measurement_unit=F('ingredient__measurement_unit')).annotate(
-            amount=Sum('amount')
+        """Загрузка файла с корзины в формате txt, csv или pdf."""
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        # Строки читаются здесь: под ASGI тело ответа перебирается
+        # в async-контексте, где запросы к базе запрещены.
+        response = StreamingHttpResponse(
+            renderer.stream(list(shopping_list(request.user))),
+            content_type=content_type,
         )
-        data = []
-        for ingredient in ingredients:
-            data.append(
-                f'{ingredient["name"]} - '
-                f'{ingredient["amount"]} '
-                f'{ingredient["measurement_unit"]}'
-            )
-        content = 'Список покупок:\n\n' + '\n'.join(data)
-        filename = 'shopping_cart.txt'
-        request = HttpResponse(content, content_type='text/plain')
-        request['Content-Disposition'] = f'attachment; filename={filename}'
-        return request
+        filename = f'shopping_cart.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
@@ -6,6 +6,8 @@ from dotenv import load_dotenv
 
 from .models import (Favorite, Ingredient, IngredientAmount, Recipe,
                      ShoppingCart, Tag)
+from .shopping_list import (amounts_diff, change_recipe_in_shopping_lists,
+                            recipe_amounts)
 
 load_dotenv()
 
@@ -45,8 +47,19 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (IngredientInline,)
     empty_value_display = os.getenv('VALUE_DISPLAY', '---')
 
+    @admin.display(description='В избранном',
+                   ordering='favorites_count')
     def count_favorites(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        """Изменения ингредиентов попадают в списки покупок."""
+        recipe = form.instance
+        old_amounts = recipe_amounts(recipe.pk) if change else {}
+        super().save_related(request, form, formsets, change)
+        change_recipe_in_shopping_lists(
+            recipe.pk, amounts_diff(old_amounts, recipe_amounts(recipe.pk))
+        )
 
 
 @admin.register(Favorite)
@@ -0,0 +1,110 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from recipes.models import Recipe, ShoppingCart
+from recipes.shopping_list import rebuild_shopping_lists
+from recipes.trending import withdraw_events
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+
+
+def recipes_in_list(model, user_id, recipe_ids):
+    """
+    Существующие рецепты из recipe_ids и дата их добавления в список
+    пользователя {recipe_id: date_added или None} одним запросом.
+    """
+    return dict(Recipe.objects.filter(pk__in=recipe_ids).annotate(
+        date_added=Subquery(model.objects.filter(
+            user_id=user_id, recipe=OuterRef('pk')
+        ).values('date_added'))
+    ).order_by().values_list('pk', 'date_added'))
+
+
+def lists_changed(model, user_id, recipe_ids):
+    """
+    Пакетные операции не отправляют сигналы: счётчики рецептов
+    пересчитываются по связям, список покупок - для пользователя.
+    """
+    if not recipe_ids:
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update_counters()
+    if model is ShoppingCart:
+        rebuild_shopping_lists((user_id,))
+
+
+def insert_rows(model, user_id, recipe_ids):
+    """
+    Вставка строк одним INSERT, множество добавленных recipe_id.
+    Если параллельный запрос успел добавить часть рецептов, строки
+    вставляются по одной, уже существующие пропускаются.
+    """
+    if not recipe_ids:
+        return set()
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(
+                model(user_id=user_id, recipe_id=pk) for pk in recipe_ids
+            )
+        return set(recipe_ids)
+    except IntegrityError:
+        pass
+    added = set()
+    for pk in recipe_ids:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    (model(user_id=user_id, recipe_id=pk),)
+                )
+        except IntegrityError:
+            if not model.objects.filter(user_id=user_id,
+                                        recipe_id=pk).exists():
+                raise
+            continue
+        added.add(pk)
+    return added
+
+
+def add_recipes(model, user_id, recipe_ids):
+    """Добавление рецептов в список одним INSERT, {recipe_id: результат}."""
+    found = recipes_in_list(model, user_id, recipe_ids)
+    added = insert_rows(model, user_id, [
+        pk for pk, date_added in found.items() if date_added is None
+    ])
+    lists_changed(model, user_id, added)
+    return {pk: NOT_FOUND if pk not in found else ADDED if pk in added
+            else EXISTS for pk in recipe_ids}
+
+
+def delete_rows(model, user_id, recipe_ids):
+    """
+    Удаление строк списка одним DELETE без загрузки объектов.
+    Сигналы удаления не отправляются, их работу выполняют
+    withdraw_events() и lists_changed().
+    """
+    quote = connection.ops.quote_name
+    meta = model._meta
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(meta.db_table)} '
+            f'WHERE {quote(meta.get_field("user").column)} = %s '
+            f'AND {quote(meta.get_field("recipe").column)} IN '
+            f'({", ".join(["%s"] * len(recipe_ids))})',
+            (user_id, *recipe_ids),
+        )
+
+
+def remove_recipes(model, user_id, recipe_ids):
+    """Удаление рецептов из списка одним DELETE, {recipe_id: результат}."""
+    found = recipes_in_list(model, user_id, recipe_ids)
+    removed = {pk: date_added for pk, date_added in found.items()
+               if date_added is not None}
+    if removed:
+        delete_rows(model, user_id, list(removed))
+        withdraw_events(model, removed)
+    lists_changed(model, user_id, removed)
+    return {pk: NOT_FOUND if pk not in found else REMOVED if found[pk]
+            else MISSING for pk in recipe_ids}
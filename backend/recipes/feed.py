@@ -0,0 +1,81 @@
+from collections import defaultdict
+from itertools import islice
+
+from api.constants import FEED_BATCH_SIZE, FEED_LENGTH
+from recipes.models import FeedItem, Recipe
+from users.models import Follow
+
+
+def fan_out_recipe(recipe):
+    """Добавление нового рецепта в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True).order_by()
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, recipe_id=recipe.pk,
+                  pub_date=recipe.pub_date)
+         for user_id in followers.iterator(chunk_size=FEED_BATCH_SIZE)),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author_to_feed(user_id, author_id):
+    """Добавление в ленту последних рецептов автора после подписки."""
+    recipes = Recipe.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    ).order_by('-pub_date', '-id')[:FEED_LENGTH]
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+         for recipe_id, pub_date in recipes),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    """Удаление рецептов автора из ленты после отписки."""
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def trim_feed(user_ids=None):
+    """Удаление записей ленты старше FEED_LENGTH последних."""
+    feeds = FeedItem.objects.order_by().values('user_id').distinct()
+    if user_ids is not None:
+        feeds = feeds.filter(user_id__in=user_ids)
+    deleted = 0
+    for user_id in feeds.values_list('user_id', flat=True):
+        boundary = FeedItem.objects.filter(user_id=user_id).values_list(
+            'pub_date', 'id'
+        )[FEED_LENGTH:FEED_LENGTH + 1].first()
+        if boundary:
+            deleted += FeedItem.objects.filter(
+                user_id=user_id, pub_date__lte=boundary[0]
+            ).exclude(pub_date=boundary[0], id__gt=boundary[1]).delete()[0]
+    return deleted
+
+
+def rebuild_feed():
+    """Заполнение лент с нуля по подпискам и рецептам."""
+    FeedItem.objects.all().delete()
+    latest = defaultdict(list)
+    recipes = Recipe.objects.values_list(
+        'author_id', 'pk', 'pub_date'
+    ).order_by('author_id', '-pub_date', '-id')
+    for author_id, recipe_id, pub_date in recipes.iterator(
+            chunk_size=FEED_BATCH_SIZE):
+        if len(latest[author_id]) < FEED_LENGTH:
+            latest[author_id].append((recipe_id, pub_date))
+    follows = Follow.objects.values_list('user_id', 'author_id').order_by()
+    items = (
+        FeedItem(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for user_id, author_id in follows.iterator(chunk_size=FEED_BATCH_SIZE)
+        for recipe_id, pub_date in latest.get(author_id, ())
+    )
+    while True:
+        batch = list(islice(items, FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedItem.objects.bulk_create(batch)
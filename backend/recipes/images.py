@@ -0,0 +1,88 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from api.cache import recipe_cache
+from api.constants import IMAGE_WORKERS, THUMBNAIL_SIZE
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'thumbnail': (THUMBNAIL_SIZE, 'JPEG', '_thumbnail.jpg'),
+    'thumbnail_webp': (THUMBNAIL_SIZE, 'WEBP', '_thumbnail.webp'),
+    'webp': (None, 'WEBP', '.webp'),
+}
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS,
+                                       thread_name_prefix='recipe-images')
+    return _executor
+
+
+def render_variant(image, size, image_format):
+    if size:
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=85, optimize=True)
+    return buffer.getvalue()
+
+
+def build_image_variants(recipe_id):
+    """
+    Создание уменьшенной копии и WebP-версий фото рецепта рядом
+    с оригиналом. Пути сохраняются в Recipe.image_variants.
+    """
+    source = Recipe.objects.filter(pk=recipe_id).values_list(
+        'image', flat=True
+    ).first()
+    if not source:
+        return
+    with default_storage.open(source) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    root = os.path.splitext(source)[0]
+    variants = {'source': source}
+    for name, (size, image_format, suffix) in VARIANTS.items():
+        path = f'{root}{suffix}'
+        if path == source:
+            variants[name] = source
+            continue
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        variants[name] = default_storage.save(
+            path, ContentFile(render_variant(image, size, image_format))
+        )
+    Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants=variants
+    )
+    recipe_cache.invalidate(recipe_id)
+
+
+def run_image_variants(recipe_id):
+    try:
+        build_image_variants(recipe_id)
+    except Exception:
+        logger.exception('Не удалось обработать фото рецепта %s', recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_image_variants(recipe_id):
+    """Обработка фото в фоновом потоке после фиксации транзакции."""
+    transaction.on_commit(
+        lambda: executor().submit(run_image_variants, recipe_id)
+    )
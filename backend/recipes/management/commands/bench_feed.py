@@ -0,0 +1,102 @@
+from datetime import timedelta
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.constants import PAGE_SIZE
+from recipes.models import FeedItem, Recipe
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    """
+    Сравнение чтения ленты подписок из FeedItem и через соединение
+    Follow с Recipe для пользователя с тысячами подписок.
+    Данные создаются во временной транзакции и откатываются.
+    Выполнить - python manage.py bench_feed --authors 5000.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=2000,
+                            help='Количество авторов в подписках.')
+        parser.add_argument('--recipes', type=int, default=5,
+                            help='Количество рецептов у каждого автора.')
+        parser.add_argument('--queries', type=int, default=200,
+                            help='Количество чтений первой страницы.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            reader = self.seed(options['authors'], options['recipes'])
+            self.report('Follow + Recipe', options['queries'],
+                        lambda: self.read_join(reader))
+            self.report('FeedItem', options['queries'],
+                        lambda: self.read_feed(reader))
+            transaction.set_rollback(True)
+
+    def seed(self, authors, recipes):
+        now = timezone.now()
+        reader = User.objects.create(username='bench_feed_reader',
+                                     email='bench_feed_reader@example.com')
+        User.objects.bulk_create(
+            User(username=f'bench_feed_{number}',
+                 email=f'bench_feed_{number}@example.com')
+            for number in range(authors)
+        )
+        author_ids = list(User.objects.filter(
+            username__startswith='bench_feed_'
+        ).exclude(pk=reader.pk).values_list('pk', flat=True))
+        Follow.objects.bulk_create(
+            Follow(user=reader, author_id=author_id)
+            for author_id in author_ids
+        )
+        Recipe.objects.bulk_create(
+            (Recipe(author_id=author_id, name=f'Рецепт {number}',
+                    text='Описание', cooking_time=1)
+             for author_id in author_ids for number in range(recipes)),
+            batch_size=5000,
+        )
+        minutes = 0
+        feed = []
+        for pk in Recipe.objects.filter(
+            author_id__in=author_ids
+        ).values_list('pk', flat=True).order_by('pk').iterator():
+            minutes += 1
+            feed.append(FeedItem(user=reader, recipe_id=pk,
+                                 pub_date=now - timedelta(minutes=minutes)))
+        FeedItem.objects.bulk_create(feed, batch_size=5000)
+        return reader
+
+    @staticmethod
+    def read_join(reader):
+        queryset = Recipe.objects.add_annotations(reader.pk).filter(
+            author__following__user=reader
+        ).select_related('author').defer('search_vector')
+        return queryset.count(), list(
+            queryset.order_by('-pub_date', '-id')[:PAGE_SIZE]
+        )
+
+    @staticmethod
+    def read_feed(reader):
+        items = FeedItem.objects.filter(user=reader)
+        page = list(items.only('recipe_id', 'pub_date')[:PAGE_SIZE])
+        recipes = Recipe.objects.add_annotations(reader.pk).select_related(
+            'author'
+        ).defer('search_vector').in_bulk(
+            [item.recipe_id for item in page]
+        )
+        return items.count(), [recipes[item.recipe_id] for item in page]
+
+    def report(self, title, queries, read):
+        timings = []
+        for _ in range(queries):
+            start = perf_counter()
+            read()
+            timings.append((perf_counter() - start) * 1000)
+        percentiles = quantiles(timings, n=100)
+        self.stdout.write(
+            f'{title}: среднее {mean(timings):.3f} мс, '
+            f'p50 {percentiles[49]:.3f} мс, p95 {percentiles[94]:.3f} мс'
+        )
@@ -0,0 +1,83 @@
+import random
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from api.constants import PAGE_SIZE
+from recipes.models import Recipe, Tag
+from users.models import User
+
+TAGS = (
+    ('bench_breakfast', '#000001'),
+    ('bench_lunch', '#000002'),
+    ('bench_dinner', '#000003'),
+    ('bench_dessert', '#000004'),
+)
+
+
+class Command(BaseCommand):
+    """
+    Сравнение фильтра рецептов по тэгам через соединение с тэгами
+    и через маску тэгов рецепта.
+    Данные создаются во временной транзакции и откатываются.
+    Выполнить - python manage.py bench_tag_filter --recipes 100000.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=100,
+                            help='Количество запросов первой страницы.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            tags = self.seed(options['recipes'], rng)
+            filters = [rng.sample(tags, rng.randint(1, 2))
+                       for _ in range(options['queries'])]
+            self.report('Соединение с тэгами', filters, lambda chosen: (
+                Recipe.objects.filter(
+                    tags__slug__in=[tag.slug for tag in chosen]
+                ).distinct()
+            ))
+            self.report('Маска тэгов', filters, Recipe.objects.with_tags)
+            transaction.set_rollback(True)
+
+    def seed(self, recipes, rng):
+        author = User.objects.create(username='bench_tag_filter',
+                                     email='bench_tag_filter@example.com')
+        tags = [Tag.objects.create(name=slug, color=color, slug=slug)
+                for slug, color in TAGS]
+        Recipe.objects.bulk_create(
+            (Recipe(author=author, name=f'Рецепт {number}',
+                    text='Описание', cooking_time=1)
+             for number in range(recipes)),
+            batch_size=5000,
+        )
+        created = Recipe.objects.filter(author=author)
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=pk, tag_id=tag.pk)
+             for pk in created.values_list('pk', flat=True).iterator()
+             for tag in rng.sample(tags, rng.randint(1, 2))),
+            batch_size=5000,
+        )
+        created.update_tags_mask()
+        return tags
+
+    def report(self, title, filters, filter_recipes):
+        timings = []
+        for chosen in filters:
+            start = perf_counter()
+            queryset = filter_recipes(chosen)
+            queryset.count()
+            list(queryset.order_by('-pub_date', '-id').values(
+                'pk'
+            )[:PAGE_SIZE])
+            timings.append((perf_counter() - start) * 1000)
+        percentiles = quantiles(timings, n=100)
+        self.stdout.write(
+            f'{title}: среднее {mean(timings):.3f} мс, '
+            f'p50 {percentiles[49]:.3f} мс, p95 {percentiles[94]:.3f} мс'
+        )
@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+
+from recipes.images import build_image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Создание уменьшенных копий фото для рецептов, у которых их нет.
+    Выполнить - python manage.py build_image_variants.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересоздать копии для всех рецептов.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        done = 0
+        for recipe_id in recipes.values_list('pk', flat=True).iterator():
+            build_image_variants(recipe_id)
+            done += 1
+        self.stdout.write(f'Обработано фото рецептов: {done}')
@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe, related_count
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт счётчиков избранного, корзин, рецептов и подписчиков
+    и масок тэгов рецептов.
+    Выполнить - python manage.py rebuild_counters.
+    """
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        recipes = Recipe.objects.update_counters()
+        Recipe.objects.update_tags_mask()
+        users = User.objects.update(
+            recipes_count=related_count(Recipe, 'author'),
+            followers_count=related_count(Follow, 'author'),
+        )
+        self.stdout.write(
+            f'Счётчики пересчитаны: рецептов - {recipes}, '
+            f'пользователей - {users}'
+        )
@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт списков покупок пользователей по корзинам.
+    Выполнить - python manage.py rebuild_shopping_lists.
+    """
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        rebuild_shopping_lists()
+        self.stdout.write(
+            'Списки покупок пересчитаны: строк - '
+            f'{ShoppingListItem.objects.count()}'
+        )
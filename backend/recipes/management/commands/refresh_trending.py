@@ -0,0 +1,56 @@
+from collections import defaultdict
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from api.constants import TRENDING_MIN_SCORE, TRENDING_WINDOW_HALF_LIVES
+from recipes.models import RecipeTrend
+from recipes.trending import HALF_LIFE, WEIGHTS, decay
+
+
+class Command(BaseCommand):
+    """
+    Инкрементальный пересчёт рейтинга трендов.
+    Накопленные рейтинги затухают с момента прошлого пересчёта,
+    к ним добавляются только новые добавления в избранное и корзину.
+    Выполнять периодически - python manage.py refresh_trending.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Пересчитать рейтинги с нуля.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['rebuild']:
+            RecipeTrend.objects.all().delete()
+        since = RecipeTrend.objects.aggregate(
+            Max('refreshed_at')
+        )['refreshed_at__max'] or now - HALF_LIFE * TRENDING_WINDOW_HALF_LIVES
+        RecipeTrend.objects.update(
+            score=F('score') * decay(now - since), refreshed_at=now
+        )
+        RecipeTrend.objects.filter(score__lt=TRENDING_MIN_SCORE).delete()
+        gains = defaultdict(float)
+        for model, weight in WEIGHTS.items():
+            events = model.objects.filter(
+                date_added__gt=since, date_added__lte=now
+            ).values_list('recipe_id', 'date_added').order_by()
+            for recipe_id, date_added in events.iterator():
+                gains[recipe_id] += weight * decay(now - date_added)
+        trends = RecipeTrend.objects.in_bulk(gains.keys())
+        for trend in trends.values():
+            trend.score += gains[trend.pk]
+        RecipeTrend.objects.bulk_update(trends.values(), ('score',))
+        RecipeTrend.objects.bulk_create(
+            RecipeTrend(recipe_id=recipe_id, score=score, refreshed_at=now)
+            for recipe_id, score in gains.items()
+            if recipe_id not in trends
+        )
+        self.stdout.write(
+            'Рейтинг трендов обновлён, рецептов с новыми событиями - '
+            f'{len(gains)}'
+        )
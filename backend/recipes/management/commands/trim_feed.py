@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from api.constants import FEED_LENGTH
+from recipes.feed import rebuild_feed, trim_feed
+
+
+class Command(BaseCommand):
+    """
+    Обрезка лент подписок до FEED_LENGTH последних рецептов.
+    Выполнять периодически - python manage.py trim_feed.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Заполнить ленты заново по подпискам.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuild_feed()
+        deleted = trim_feed()
+        self.stdout.write(
+            f'Ленты обрезаны до {FEED_LENGTH} записей, удалено - {deleted}'
+        )
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_shopping_list_item'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipetrend',
+            index=models.Index(fields=['-score', '-recipe'], name='recipe_trend_score_idx'),
+        ),
+        migrations.AlterField(
+            model_name='recipetrend',
+            name='score',
+            field=models.FloatField(default=0, verbose_name='Рейтинг'),
+        ),
+    ]
@@ -1,15 +1,34 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
-from django.db.models.functions import Length
+from django.db import connections, models
+from django.db.models.functions import Cast, Coalesce, Length, Power
 
 from api.constants import (MIN_AMOUNT_INGREDIENTS, MIN_COOKING_TIME,
-                           RECIPE_NAME_LENGTH, TAG_COLOR_LENGTH,
-                           TAG_NAME_LENGTH, TAG_SLUG_LENGTH)
-from users.models import User
+                           RECIPE_NAME_LENGTH, SEARCH_CONFIG, TAG_BITS,
+                           TAG_COLOR_LENGTH, TAG_NAME_LENGTH,
+                           TAG_SLUG_LENGTH)
+from users.models import DenormalizedFieldsMixin, User
 
 models.CharField.register_lookup(Length)
 
 
+def related_count(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на объект."""
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(
+                **{field: models.OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=models.Count('pk')
+            ).values('total')
+        ),
+        0,
+    )
+
+
 class Ingredient(models.Model):
     """Класс игредиентов."""
     name = models.CharField(
@@ -70,15 +89,50 @@ class Tag(models.Model):
         max_length=TAG_SLUG_LENGTH,
         db_index=True
     )
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        editable=False,
+        verbose_name='Номер бита в маске тэгов рецепта',
+    )
 
     class Meta:
         ordering = ('name',)
         verbose_name = 'Тэг'
         verbose_name_plural = 'Тэги'
+        constraints = (
+            models.CheckConstraint(
+                check=models.Q(bit__lt=TAG_BITS),
+                name='tag_bit_range',
+            ),
+        )
 
     def __str__(self):
         return self.name
 
+    @property
+    def mask(self):
+        return 1 << self.bit
+
+    @staticmethod
+    def free_bits(count=1):
+        """Первые свободные биты маски, тэгов не больше TAG_BITS."""
+        used = set(Tag.objects.values_list('bit', flat=True))
+        bits = [bit for bit in range(TAG_BITS) if bit not in used][:count]
+        if len(bits) < count:
+            raise ValidationError(
+                f'Тэгов не может быть больше {TAG_BITS}.'
+            )
+        return bits
+
+    def clean(self):
+        if self.bit is None:
+            self.free_bits()
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            self.bit, = self.free_bits()
+        super().save(*args, **kwargs)
+
 
 class QuerySet(models.QuerySet):
     """Класс для добавления избранного и списка корзины."""
@@ -99,14 +153,81 @@ class QuerySet(models.QuerySet):
             ),
         )
 
+    def with_tags(self, tags):
+        """Рецепты хотя бы с одним из тэгов, проверка по маске."""
+        return self.alias(
+            matched_tags=models.F('tags_mask').bitand(
+                sum(tag.mask for tag in tags)
+            )
+        ).filter(matched_tags__gt=0)
+
+    def update_tags_mask(self):
+        """Пересчёт маски тэгов по связям рецептов с тэгами."""
+        return self.update(tags_mask=Coalesce(
+            models.Subquery(
+                Recipe.tags.through.objects.filter(
+                    recipe=models.OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    mask=models.Sum(Cast(Power(2, 'tag__bit'),
+                                         models.BigIntegerField()))
+                ).values('mask')
+            ),
+            0,
+        ))
+
+    def update_counters(self):
+        """Пересчёт счётчиков избранного и корзин по связям."""
+        return self.update(
+            favorites_count=related_count(Favorite, 'recipe'),
+            in_carts_count=related_count(ShoppingCart, 'recipe'),
+        )
+
+    def latest_per_author(self, limit):
+        """Последние рецепты каждого автора одним запросом."""
+        return self.filter(
+            pk__in=models.Subquery(
+                Recipe.objects.filter(
+                    author=models.OuterRef('author')
+                ).values('pk')[:limit]
+            )
+        )
+
+    def search(self, text):
+        """
+        Полнотекстовый поиск по названию и описанию с ранжированием.
+        Вне PostgreSQL - поиск подстроки без ранжирования.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            return self.filter(
+                models.Q(name__icontains=text)
+                | models.Q(text__icontains=text)
+            )
+        query = SearchQuery(text, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        return self.filter(search_vector=query).annotate(
+            rank=SearchRank(models.F('search_vector'), query)
+        ).order_by('-rank', '-pub_date')
+
+    def update_search_vector(self):
+        """Пересчёт поискового вектора, только для PostgreSQL."""
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        return self.update(
+            search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            )
+        )
+
 
-class Recipe(models.Model):
+class Recipe(DenormalizedFieldsMixin, models.Model):
     """Класс рецептов."""
 
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
+        db_index=False,
         verbose_name='Автор рецепта',
     )
     name = models.CharField(
@@ -119,6 +240,12 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         verbose_name='Фото'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии фото',
+    )
     text = models.TextField(
         verbose_name='Описание',
     )
@@ -133,6 +260,11 @@ class Recipe(models.Model):
         related_name='recipes',
         verbose_name='Тег',
     )
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Маска тэгов',
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления',
         validators=[
@@ -146,13 +278,43 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в списки покупок',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
 
     objects = QuerySet.as_manager()
+    denormalized_fields = ('favorites_count', 'in_carts_count',
+                           'image_variants', 'tags_mask')
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            GinIndex(fields=('search_vector',), name='recipe_search_idx'),
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=('-favorites_count', '-pub_date'),
+                         name='recipe_popular_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=('id',),
+                         condition=models.Q(image_variants={})
+                         & ~models.Q(image=''),
+                         name='recipe_no_image_variants_idx'),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('name', 'author'),
@@ -168,6 +330,73 @@ class Recipe(models.Model):
         return f'{self.name} от {self.author.username}'
 
 
+class RecipeTrend(models.Model):
+    """Рейтинг рецепта с затуханием во времени для ленты трендов."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trend',
+        verbose_name='Рецепт',
+    )
+    score = models.FloatField(
+        default=0,
+        verbose_name='Рейтинг',
+    )
+    refreshed_at = models.DateTimeField(
+        verbose_name='Дата пересчёта',
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(fields=('-score', '-recipe'),
+                         name='recipe_trend_score_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.score:.3f}'
+
+
+class FeedItem(models.Model):
+    """
+    Запись ленты подписок: рецепт автора, на которого подписан
+    пользователь. Заполняется при публикации рецепта и подписке.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        db_index=False,
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-id'),
+                         name='feed_user_pub_date_idx'),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_item'
+            ),
+        )
+
+
 class IngredientAmount(models.Model):
     """Модель показывает кол-во ингредиентов."""
     ingredient = models.ForeignKey(
@@ -180,6 +409,7 @@ class IngredientAmount(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         related_name='ingredients_amount',
+        db_index=False,
         verbose_name='Рецепт'
     )
     amount = models.PositiveSmallIntegerField(
@@ -193,6 +423,12 @@ class IngredientAmount(models.Model):
         ],
     )
 
+    class Meta:
+        indexes = (
+            models.Index(fields=('recipe', 'ingredient', 'amount'),
+                         name='ingredient_amount_recipe_idx'),
+        )
+
 
 class Favorite(models.Model):
     """Класс добавления рецептов в избранное."""
@@ -200,6 +436,7 @@ class Favorite(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='favorite',
+        db_index=False,
         verbose_name='Автор списка избранного',
     )
     recipe = models.ForeignKey(
@@ -218,6 +455,12 @@ class Favorite(models.Model):
         ordering = ('user',)
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные'
+        indexes = (
+            models.Index(fields=('user', '-date_added'),
+                         name='favorite_user_date_added_idx'),
+            models.Index(fields=('date_added',),
+                         name='favorite_date_added_idx'),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
@@ -232,6 +475,7 @@ class ShoppingCart(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='shopping_cart',
+        db_index=False,
         verbose_name='Автор списка покупок',
     )
     recipe = models.ForeignKey(
@@ -250,9 +494,64 @@ class ShoppingCart(models.Model):
         ordering = ('-id',)
         verbose_name = 'Список покупок'
         verbose_name_plural = 'В корзине'
+        indexes = (
+            models.Index(fields=('date_added',),
+                         name='shopping_cart_date_added_idx'),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
                 name='unique_shopping_cart'
             ),
         )
+
+
+class ShoppingListItem(models.Model):
+    """
+    Строка списка покупок: сумма ингредиента по всем рецептам
+    в корзине пользователя. Обновляется при изменении корзины
+    и ингредиентов рецептов, см. recipes.shopping_list.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        db_index=False,
+        verbose_name='Автор списка покупок',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    name = models.CharField(
+        max_length=150,
+        verbose_name='Название ингредиента',
+    )
+    measurement_unit = models.CharField(
+        max_length=150,
+        verbose_name='Единицы измерения',
+    )
+    amount = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        ordering = ('name', 'measurement_unit')
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        indexes = (
+            models.Index(fields=('user', 'name', 'measurement_unit'),
+                         name='shopping_list_user_name_idx'),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.name}: {self.amount} {self.measurement_unit}'
@@ -0,0 +1,124 @@
+from collections import Counter
+from itertools import islice
+
+from django.db.models import Case, ExpressionWrapper, F, IntegerField, Sum
+from django.db.models import Value, When
+
+from api.constants import SHOPPING_LIST_BATCH_SIZE
+from recipes.models import (Ingredient, IngredientAmount, ShoppingCart,
+                            ShoppingListItem)
+
+
+def recipe_amounts(recipe_id):
+    """Количества ингредиентов рецепта {ingredient_id: количество}."""
+    return dict(IngredientAmount.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id').annotate(Sum('amount')).order_by())
+
+
+def amounts_diff(old, new):
+    """Изменение количеств ингредиентов рецепта, без нулевых."""
+    diff = Counter(new)
+    diff.subtract(old)
+    return {ingredient: amount for ingredient, amount in diff.items()
+            if amount}
+
+
+def change_shopping_lists(user_ids, amounts, ingredients=None):
+    """
+    Прибавление amounts {ingredient_id: количество} к спискам покупок
+    пользователей. Недостающие строки создаются с нулём, затем все
+    меняются одним UPDATE, поэтому параллельные изменения не теряются.
+    ingredients - уже загруженные {ingredient_id: Ingredient}.
+    """
+    if not amounts or not user_ids:
+        return
+    added = [ingredient for ingredient, amount in amounts.items()
+             if amount > 0]
+    if added:
+        if ingredients is None:
+            ingredients = Ingredient.objects.in_bulk(added)
+        ShoppingListItem.objects.bulk_create(
+            (ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient,
+                name=ingredients[ingredient].name,
+                measurement_unit=ingredients[ingredient].measurement_unit,
+            ) for user_id in user_ids for ingredient in added
+                if ingredient in ingredients),
+            batch_size=SHOPPING_LIST_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+    items = ShoppingListItem.objects.filter(user_id__in=user_ids,
+                                            ingredient_id__in=amounts)
+    items.update(amount=ExpressionWrapper(
+        F('amount') + Case(
+            *(When(ingredient_id=ingredient, then=Value(amount))
+              for ingredient, amount in amounts.items()),
+            default=Value(0),
+        ),
+        output_field=IntegerField(),
+    ))
+    if len(added) < len(amounts):
+        items.filter(amount=0).delete()
+
+
+def add_recipe_to_shopping_list(user_id, recipe_id):
+    """Ингредиенты рецепта в список покупок одним запросом на чтение."""
+    amounts = {}
+    ingredients = {}
+    for ingredient_id, name, measurement_unit, amount in (
+        IngredientAmount.objects.filter(recipe_id=recipe_id).values_list(
+            'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit',
+        ).annotate(Sum('amount')).order_by()
+    ):
+        amounts[ingredient_id] = amount
+        ingredients[ingredient_id] = Ingredient(
+            pk=ingredient_id, name=name, measurement_unit=measurement_unit
+        )
+    change_shopping_lists((user_id,), amounts, ingredients)
+
+
+def remove_recipe_from_shopping_list(user_id, recipe_id):
+    change_shopping_lists((user_id,), {
+        ingredient: -amount
+        for ingredient, amount in recipe_amounts(recipe_id).items()
+    })
+
+
+def change_recipe_in_shopping_lists(recipe_id, amounts):
+    """Изменение ингредиентов рецепта в списках всех, у кого он в корзине."""
+    if not amounts:
+        return
+    users = ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+        'user_id', flat=True
+    ).order_by().iterator(chunk_size=SHOPPING_LIST_BATCH_SIZE)
+    while True:
+        batch = list(islice(users, SHOPPING_LIST_BATCH_SIZE))
+        if not batch:
+            return
+        change_shopping_lists(batch, amounts)
+
+
+def rebuild_shopping_lists(user_ids=None):
+    """Пересчёт списков покупок по корзинам, для всех или user_ids."""
+    items = ShoppingListItem.objects.all()
+    carts = {'recipe__shopping_cart__isnull': False}
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+        # Одним filter(), иначе второе соединение с корзинами.
+        carts = {'recipe__shopping_cart__user_id__in': user_ids}
+    amounts = IngredientAmount.objects.filter(**carts)
+    items.delete()
+    rows = amounts.values_list(
+        'recipe__shopping_cart__user_id', 'ingredient_id',
+        'ingredient__name', 'ingredient__measurement_unit',
+    ).annotate(Sum('amount')).order_by()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                          name=name, measurement_unit=measurement_unit,
+                          amount=amount)
+         for user_id, ingredient_id, name, measurement_unit, amount
+         in rows.iterator(chunk_size=SHOPPING_LIST_BATCH_SIZE)),
+        batch_size=SHOPPING_LIST_BATCH_SIZE,
+    )
@@ -0,0 +1,131 @@
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from recipes.feed import (add_author_to_feed, fan_out_recipe,
+                          remove_author_from_feed)
+from recipes.images import schedule_image_variants
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.shopping_list import (add_recipe_to_shopping_list,
+                                   remove_recipe_from_shopping_list)
+from recipes.trending import withdraw_events
+from users.models import Follow, User
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарное изменение счётчика на delta."""
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_vector(sender, instance, **kwargs):
+    """Пересчёт поискового вектора рецепта после сохранения."""
+    Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_save, sender=Recipe)
+def update_image_variants(sender, instance, **kwargs):
+    """Обработка фото рецепта, если оно изменилось."""
+    if (instance.image
+            and instance.image_variants.get('source') != instance.image.name):
+        schedule_image_variants(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+    withdraw_events(Favorite, {instance.recipe_id: instance.date_added})
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'in_carts_count', -1)
+    withdraw_events(ShoppingCart, {instance.recipe_id: instance.date_added})
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    """Добавление нового рецепта в ленты подписчиков автора."""
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Follow)
+def feed_follow_created(sender, instance, created, **kwargs):
+    if created:
+        add_author_to_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def feed_follow_deleted(sender, instance, **kwargs):
+    remove_author_from_feed(instance.user_id, instance.author_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    """Пересчёт маски тэгов у рецептов, чьи тэги изменились."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    elif pk_set is None:
+        recipes = Recipe.objects.with_tags([instance])
+    else:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    recipes.update_tags_mask()
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    """Снятие бита удалённого тэга, чтобы его можно было занять."""
+    Recipe.objects.with_tags([instance]).update_tags_mask()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_list_recipe_added(sender, instance, created, **kwargs):
+    if created:
+        add_recipe_to_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_list_recipe_removed(sender, instance, **kwargs):
+    """
+    До удаления: при удалении рецепта его ингредиенты удаляются
+    в той же операции, а pre_delete отправляется раньше.
+    """
+    remove_recipe_from_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def shopping_list_ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        ShoppingListItem.objects.filter(ingredient=instance).update(
+            name=instance.name,
+            measurement_unit=instance.measurement_unit,
+        )
@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Greatest
+
+from api.constants import (TRENDING_CART_WEIGHT, TRENDING_FAVORITE_WEIGHT,
+                           TRENDING_HALF_LIFE_HOURS)
+from recipes.models import Favorite, RecipeTrend, ShoppingCart
+
+HALF_LIFE = timedelta(hours=TRENDING_HALF_LIFE_HOURS)
+WEIGHTS = {
+    Favorite: TRENDING_FAVORITE_WEIGHT,
+    ShoppingCart: TRENDING_CART_WEIGHT,
+}
+
+
+def decay(age):
+    """Вес события возрастом age."""
+    return 0.5 ** (age / HALF_LIFE)
+
+
+def withdraw_events(model, events):
+    """
+    Вычитание из рейтинга вклада удалённых событий model
+    {recipe_id: date_added}, уже учтённых при прошлом пересчёте.
+    Более новые события рейтинг ещё не увеличили.
+    """
+    if not events:
+        return
+    deltas = {
+        recipe_id: WEIGHTS[model] * decay(refreshed_at - events[recipe_id])
+        for recipe_id, refreshed_at in RecipeTrend.objects.filter(
+            recipe_id__in=events
+        ).values_list('recipe_id', 'refreshed_at')
+        if events[recipe_id] <= refreshed_at
+    }
+    if not deltas:
+        return
+    RecipeTrend.objects.filter(recipe_id__in=deltas).update(
+        score=Greatest(
+            F('score') - Case(
+                *(When(recipe_id=recipe_id, then=Value(delta))
+                  for recipe_id, delta in deltas.items()),
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+            Value(0.0),
+        )
+    )
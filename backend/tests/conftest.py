@@ -0,0 +1,148 @@
+from io import StringIO
+from itertools import cycle, islice
+
+import pytest
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import ingredients_cache, tags_cache
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+USERS = 1000
+RECIPES_PER_USER = 3
+INGREDIENTS_PER_RECIPE = 5
+FAVORITES_PER_USER = 10
+CARTS_PER_USER = 5
+FOLLOWS_PER_USER = 10
+ACTIVE_USERS = 500
+PASSWORD = 'Seed-password-123'
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+         'FcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==')
+
+
+def seed():
+    """
+    Данные объёмом, близким к рабочему: ингредиенты из
+    data/ingredients.csv, тысяча пользователей, тысячи рецептов,
+    подписок, избранного и списков покупок.
+    """
+    call_command('db_import', stdout=StringIO())
+    Tag.objects.bulk_create(
+        Tag(name=name, color=color, slug=slug, bit=bit)
+        for bit, (name, color, slug) in enumerate((
+            ('Завтрак', '#E26C2D', 'breakfast'),
+            ('Обед', '#49B64E', 'lunch'),
+            ('Ужин', '#8775D2', 'dinner'),
+        ))
+    )
+    tags = list(Tag.objects.values_list('pk', flat=True))
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        User(email=f'user{number}@foodgram.ru', username=f'user{number}',
+             first_name='Имя', last_name='Фамилия', password=password)
+        for number in range(USERS)
+    )
+    users = list(User.objects.values_list('pk', flat=True))
+    Recipe.objects.bulk_create(
+        (Recipe(author_id=author, name=f'Рецепт {author}-{number}',
+                text='Описание рецепта', cooking_time=10 + number,
+                image='recipes/images/seed.png')
+         for author in users for number in range(RECIPES_PER_USER)),
+        batch_size=1000,
+    )
+    recipes = list(Recipe.objects.values_list('pk', flat=True))
+    ingredients = cycle(Ingredient.objects.values_list('pk', flat=True))
+    IngredientAmount.objects.bulk_create(
+        (IngredientAmount(recipe_id=recipe, ingredient_id=ingredient,
+                          amount=100)
+         for recipe in recipes
+         for ingredient in islice(ingredients, INGREDIENTS_PER_RECIPE)),
+        batch_size=5000,
+    )
+    Recipe.tags.through.objects.bulk_create(
+        (Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+         for recipe in recipes for tag in tags[recipe % 2:recipe % 2 + 2]),
+        batch_size=5000,
+    )
+    active = users[:ACTIVE_USERS]
+    Follow.objects.bulk_create(
+        (Follow(user_id=user, author_id=author) for index, user
+         in enumerate(active)
+         for author in users[index + 1:index + 1 + FOLLOWS_PER_USER]),
+        batch_size=5000,
+    )
+    for model, count in ((Favorite, FAVORITES_PER_USER),
+                         (ShoppingCart, CARTS_PER_USER)):
+        model.objects.bulk_create(
+            (model(user_id=user, recipe_id=recipe) for index, user
+             in enumerate(active)
+             for recipe in recipes[index * 3:index * 3 + count]),
+            batch_size=5000,
+        )
+    call_command('rebuild_counters', stdout=StringIO())
+    call_command('trim_feed', '--rebuild', stdout=StringIO())
+    call_command('rebuild_shopping_lists', stdout=StringIO())
+    call_command('refresh_trending', '--rebuild', stdout=StringIO())
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        seed()
+
+
+@pytest.fixture(autouse=True)
+def local_caches(settings):
+    settings.CACHES = {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': alias}
+        for alias in ('default', 'catalog')
+    }
+    yield
+    for alias in ('default', 'catalog'):
+        caches[alias].clear()
+    tags_cache.invalidate()
+    ingredients_cache.invalidate()
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.get(email='user0@foodgram.ru')
+
+
+@pytest.fixture
+def author(db):
+    return User.objects.get(email='user700@foodgram.ru')
+
+
+@pytest.fixture
+def anonymous_client(db):
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def recipe_payload(db):
+    tags = list(Tag.objects.values_list('pk', flat=True)[:2])
+    ingredients = Ingredient.objects.values_list('pk', flat=True)[:3]
+    return {
+        'name': 'Новый рецепт',
+        'text': 'Описание нового рецепта',
+        'cooking_time': 15,
+        'image': IMAGE,
+        'tags': tags,
+        'ingredients': [{'id': ingredient, 'amount': 50}
+                        for ingredient in ingredients],
+    }
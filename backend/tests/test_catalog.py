@@ -0,0 +1,118 @@
+import time
+
+import pytest
+from django.db import transaction
+
+from api.cache import ingredients_cache, tags_cache
+from recipes.models import Ingredient, Tag
+
+TAG_FIELDS = {'id', 'name', 'color', 'slug'}
+INGREDIENT_FIELDS = {'id', 'name', 'measurement_unit'}
+
+
+def test_tags_list(anonymous_client, user_client,
+                   django_assert_max_num_queries):
+    for client in (anonymous_client, user_client):
+        with django_assert_max_num_queries(2):
+            response = client.get('/api/tags/')
+        assert response.status_code == 200
+        assert len(response.data) == Tag.objects.count()
+        for tag in response.data:
+            assert set(tag) == TAG_FIELDS
+
+
+def test_tag_detail(anonymous_client, django_assert_max_num_queries):
+    tag = Tag.objects.first()
+    with django_assert_max_num_queries(1):
+        response = anonymous_client.get(f'/api/tags/{tag.pk}/')
+    assert response.status_code == 200
+    assert set(response.data) == TAG_FIELDS
+
+
+@pytest.mark.parametrize('url', (
+    '/api/ingredients/',
+    '/api/ingredients/?name=мол',
+    '/api/ingredients/?name=МОЛ',
+))
+def test_ingredients_list(anonymous_client, user_client,
+                          django_assert_max_num_queries, url):
+    for client in (anonymous_client, user_client):
+        with django_assert_max_num_queries(2):
+            response = client.get(url)
+        assert response.status_code == 200
+        assert response.data
+        for ingredient in response.data:
+            assert set(ingredient) == INGREDIENT_FIELDS
+
+
+def test_ingredients_search_prefix_first(anonymous_client):
+    response = anonymous_client.get('/api/ingredients/?name=мол')
+    names = [ingredient['name'].lower() for ingredient in response.data]
+    prefix = [name.startswith('мол') for name in names]
+    assert prefix == sorted(prefix, reverse=True)
+    assert all('мол' in name for name in names)
+
+
+def test_ingredients_cached(anonymous_client,
+                            django_assert_max_num_queries):
+    anonymous_client.get('/api/ingredients/')
+    with django_assert_max_num_queries(0):
+        response = anonymous_client.get('/api/ingredients/')
+    assert len(response.data) == Ingredient.objects.count()
+
+
+def test_ingredient_detail(anonymous_client, django_assert_max_num_queries):
+    ingredient = Ingredient.objects.first()
+    with django_assert_max_num_queries(1):
+        response = anonymous_client.get(f'/api/ingredients/{ingredient.pk}/')
+    assert response.status_code == 200
+    assert set(response.data) == INGREDIENT_FIELDS
+
+
+def test_catalog_not_modified(anonymous_client,
+                              django_assert_max_num_queries):
+    response = anonymous_client.get('/api/tags/')
+    with django_assert_max_num_queries(0):
+        response = anonymous_client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+    assert response.status_code == 304
+
+
+def test_catalog_not_found_not_modified(anonymous_client,
+                                        django_assert_max_num_queries):
+    missing = Tag.objects.order_by('-pk').first().pk + 1
+    for _ in range(2):
+        with django_assert_max_num_queries(1):
+            response = anonymous_client.get(
+                f'/api/tags/{missing}/', HTTP_IF_NONE_MATCH='*'
+            )
+        assert response.status_code == 404
+
+
+@pytest.mark.parametrize('catalog, model', (
+    (tags_cache, Tag),
+    (ingredients_cache, Ingredient),
+))
+def test_catalog_invalidated_on_commit(db, django_capture_on_commit_callbacks,
+                                       catalog, model):
+    version = catalog.version()
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            instance = model.objects.first()
+            instance.name += ' (изм.)'
+            instance.save()
+            time.sleep(0.002)
+            assert catalog.version() == version
+    assert catalog.version() != version
+
+
+def test_ingredient_index_refreshed_on_commit(
+        anonymous_client, django_capture_on_commit_callbacks):
+    anonymous_client.get('/api/ingredients/?name=мол')
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            Ingredient.objects.create(name='Молоко тестовое',
+                                      measurement_unit='мл')
+    response = anonymous_client.get('/api/ingredients/?name=молоко тест')
+    assert [item['name'] for item in response.data] == ['Молоко тестовое']
@@ -0,0 +1,31 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import Tag
+
+
+def test_import_tags_default_path(db):
+    stdout = StringIO()
+    call_command('db_import', '--model', 'tag', stdout=stdout)
+    assert 'новых записей - 0' in stdout.getvalue()
+    assert set(Tag.objects.values_list('slug', flat=True)) >= {
+        'breakfast', 'lunch', 'dinner'
+    }
+
+
+def test_import_tags_conflict(db, tmp_path):
+    breakfast = Tag.objects.get(slug='breakfast')
+    path = tmp_path / 'tags.json'
+    path.write_text(json.dumps([
+        {'name': 'Обед', 'color': breakfast.color, 'slug': 'lunch'},
+        {'name': 'Перекус', 'color': '#000000', 'slug': 'snack'},
+    ]), encoding='UTF-8')
+    stdout, stderr = StringIO(), StringIO()
+    call_command('db_import', '--model', 'tag', '--path', str(path),
+                 stdout=stdout, stderr=stderr)
+    assert 'lunch' in stderr.getvalue()
+    assert 'конфликтов - 1' in stdout.getvalue()
+    assert Tag.objects.get(slug='lunch').color != breakfast.color
+    assert Tag.objects.filter(slug='snack').exists()
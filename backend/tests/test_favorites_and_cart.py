@@ -0,0 +1,323 @@
+import pytest
+
+from asgiref.sync import async_to_sync
+from django.core.asgi import get_asgi_application
+from django.core.signals import request_finished
+from django.db import IntegrityError, close_old_connections
+from django.db.models import Sum
+from django.db.models.signals import post_save
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.constants import TRENDING_CART_WEIGHT, TRENDING_FAVORITE_WEIGHT
+from recipes import batch
+from recipes.models import (Favorite, IngredientAmount, Recipe, RecipeTrend,
+                            ShoppingCart, ShoppingListItem)
+from recipes.trending import decay
+
+RECIPE_SHORT_FIELDS = {'id', 'name', 'image', 'image_variants',
+                       'cooking_time'}
+
+
+@pytest.mark.parametrize('action, model, limit, message', (
+    ('favorite', Favorite, 6, 'Рецепт уже добавлен в избранное'),
+    ('shopping_cart', ShoppingCart, 9, 'Рецепт уже в корзине'),
+))
+def test_add_and_remove(user_client, user, author,
+                        django_assert_max_num_queries, action, model, limit,
+                        message):
+    recipe = Recipe.objects.filter(author=author).first()
+    url = f'/api/recipes/{recipe.pk}/{action}/'
+    with django_assert_max_num_queries(limit):
+        response = user_client.post(url)
+    assert response.status_code == 201
+    assert set(response.data) == RECIPE_SHORT_FIELDS
+    assert model.objects.filter(user=user, recipe=recipe).exists()
+    with django_assert_max_num_queries(7):
+        response = user_client.post(url)
+    assert response.status_code == 400
+    assert response.data == {'non_field_errors': [message]}
+    with django_assert_max_num_queries(9):
+        response = user_client.delete(url)
+    assert response.status_code == 204
+    assert not model.objects.filter(user=user, recipe=recipe).exists()
+
+
+@pytest.mark.parametrize('action', ('favorite', 'shopping_cart'))
+def test_add_anonymous(anonymous_client, django_assert_max_num_queries,
+                       action):
+    recipe = Recipe.objects.first()
+    with django_assert_max_num_queries(0):
+        response = anonymous_client.post(
+            f'/api/recipes/{recipe.pk}/{action}/'
+        )
+    assert response.status_code == 401
+
+
+def test_counters(user_client, author):
+    recipe = Recipe.objects.filter(author=author).first()
+    favorites_count = recipe.favorites_count
+    user_client.post(f'/api/recipes/{recipe.pk}/favorite/')
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == favorites_count + 1
+
+
+@pytest.mark.parametrize('file_format, content_type', (
+    ('txt', 'text/plain'),
+    ('csv', 'text/csv'),
+    ('pdf', 'application/pdf'),
+))
+def test_download_shopping_cart(user_client, django_assert_max_num_queries,
+                                file_format, content_type):
+    with django_assert_max_num_queries(2):
+        response = user_client.get(
+            f'/api/recipes/download_shopping_cart/?format={file_format}'
+        )
+        content = b''.join(response.streaming_content)
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith(content_type)
+    assert response['Content-Disposition'] == (
+        f'attachment; filename=shopping_cart.{file_format}'
+    )
+    assert content
+
+
+def shopping_list_from_cart(user):
+    return {
+        ingredient: amount for ingredient, amount
+        in IngredientAmount.objects.filter(
+            recipe__shopping_cart__user=user
+        ).values_list('ingredient_id').annotate(Sum('amount')).order_by()
+    }
+
+
+def shopping_list_response(client, django_assert_max_num_queries):
+    with django_assert_max_num_queries(2):
+        response = client.get('/api/recipes/shopping_list/')
+    assert response.status_code == 200
+    return {item['id']: item['amount'] for item in response.data}
+
+
+def test_shopping_list(user_client, user, author, recipe_payload,
+                       django_assert_max_num_queries):
+    assert shopping_list_response(
+        user_client, django_assert_max_num_queries
+    ) == shopping_list_from_cart(user)
+    recipes = list(Recipe.objects.filter(author=author)[:2])
+    for recipe in recipes:
+        user_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+    assert shopping_list_response(
+        user_client, django_assert_max_num_queries
+    ) == shopping_list_from_cart(user)
+    author_client = APIClient()
+    author_client.force_authenticate(author)
+    del recipe_payload['image']
+    recipe_payload['ingredients'][0]['amount'] = 7
+    response = author_client.patch(f'/api/recipes/{recipes[0].pk}/',
+                                   recipe_payload, format='json')
+    assert response.status_code == 200, response.data
+    assert shopping_list_response(
+        user_client, django_assert_max_num_queries
+    ) == shopping_list_from_cart(user)
+    user_client.delete(f'/api/recipes/{recipes[0].pk}/shopping_cart/')
+    author_client.delete(f'/api/recipes/{recipes[1].pk}/')
+    assert shopping_list_response(
+        user_client, django_assert_max_num_queries
+    ) == shopping_list_from_cart(user)
+    ShoppingCart.objects.filter(user=user).delete()
+    assert not ShoppingListItem.objects.filter(user=user).exists()
+
+
+def test_shopping_list_anonymous(anonymous_client):
+    response = anonymous_client.get('/api/recipes/shopping_list/')
+    assert response.status_code == 401
+
+
+def test_download_shopping_cart_anonymous(anonymous_client):
+    response = anonymous_client.get('/api/recipes/download_shopping_cart/')
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize('action, model, counter', (
+    ('favorite', Favorite, 'favorites_count'),
+    ('shopping_cart', ShoppingCart, 'in_carts_count'),
+))
+def test_batch(user_client, user, django_assert_max_num_queries, action,
+               model, counter):
+    url = f'/api/recipes/{action}/batch/'
+    recipes = list(Recipe.objects.exclude(
+        **{f'{action}__user': user}
+    ).values_list('pk', flat=True)[:20])
+    model.objects.create(user=user, recipe_id=recipes[0])
+    missing = Recipe.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() + 1
+    with django_assert_max_num_queries(11):
+        response = user_client.post(url, {
+            'recipes': [*recipes, recipes[1], missing]
+        }, format='json')
+    assert response.status_code == 200
+    assert response.data == [
+        {'id': recipes[0], 'status': 'exists'},
+        *({'id': pk, 'status': 'added'} for pk in recipes[1:]),
+        {'id': missing, 'status': 'not_found'},
+    ]
+    assert model.objects.filter(user=user, recipe__in=recipes).count() == 20
+    for recipe in Recipe.objects.filter(pk__in=recipes):
+        assert getattr(recipe, counter) == model.objects.filter(
+            recipe=recipe
+        ).count()
+    assert shopping_list_response(
+        user_client, django_assert_max_num_queries
+    ) == shopping_list_from_cart(user)
+
+    model.objects.filter(user=user, recipe_id=recipes[0]).delete()
+    with django_assert_max_num_queries(10):
+        response = user_client.delete(url, {
+            'recipes': [recipes[0], *recipes[1:10], missing]
+        }, format='json')
+    assert response.status_code == 200
+    assert response.data == [
+        {'id': recipes[0], 'status': 'missing'},
+        *({'id': pk, 'status': 'removed'} for pk in recipes[1:10]),
+        {'id': missing, 'status': 'not_found'},
+    ]
+    assert model.objects.filter(user=user, recipe__in=recipes).count() == 10
+    for recipe in Recipe.objects.filter(pk__in=recipes):
+        assert getattr(recipe, counter) == model.objects.filter(
+            recipe=recipe
+        ).count()
+    assert shopping_list_response(
+        user_client, django_assert_max_num_queries
+    ) == shopping_list_from_cart(user)
+
+
+@pytest.mark.parametrize('action, model', (
+    ('favorite', Favorite),
+    ('shopping_cart', ShoppingCart),
+))
+def test_batch_add_concurrent(user_client, user, monkeypatch, action,
+                              model):
+    recipes = list(Recipe.objects.exclude(
+        **{f'{action}__user': user}
+    ).values_list('pk', flat=True)[:3])
+    snapshot = batch.recipes_in_list
+
+    def recipes_in_list(*args):
+        # Снимок до вставки, рецепт добавляет параллельный запрос.
+        found = snapshot(*args)
+        model.objects.bulk_create((model(user=user, recipe_id=recipes[1]),))
+        return found
+
+    monkeypatch.setattr('recipes.batch.recipes_in_list', recipes_in_list)
+    response = user_client.post(f'/api/recipes/{action}/batch/',
+                                {'recipes': recipes}, format='json')
+    assert response.status_code == 200
+    assert response.data == [
+        {'id': recipes[0], 'status': 'added'},
+        {'id': recipes[1], 'status': 'exists'},
+        {'id': recipes[2], 'status': 'added'},
+    ]
+    assert model.objects.filter(user=user, recipe__in=recipes).count() == 3
+
+
+@pytest.mark.parametrize('action, model, weight', (
+    ('favorite', Favorite, TRENDING_FAVORITE_WEIGHT),
+    ('shopping_cart', ShoppingCart, TRENDING_CART_WEIGHT),
+))
+def test_batch_remove_trending(user_client, user, action, model, weight):
+    rows = dict(model.objects.filter(user=user).values_list(
+        'recipe_id', 'date_added'
+    )[:3])
+    assert rows
+    trends = {recipe_id: (score, refreshed_at) for recipe_id, score,
+              refreshed_at in RecipeTrend.objects.filter(
+                  recipe_id__in=rows
+              ).values_list('recipe_id', 'score', 'refreshed_at')}
+    user_client.delete(f'/api/recipes/{action}/batch/',
+                       {'recipes': list(rows)}, format='json')
+    for recipe_id, (score, refreshed_at) in trends.items():
+        assert RecipeTrend.objects.get(
+            recipe_id=recipe_id
+        ).score == pytest.approx(max(
+            score - weight * decay(refreshed_at - rows[recipe_id]), 0
+        ))
+
+
+@pytest.mark.parametrize('data', (
+    {},
+    {'recipes': []},
+    {'recipes': ['abc']},
+    {'recipes': [0]},
+    {'recipes': list(range(1, 102))},
+))
+def test_batch_invalid(user_client, data):
+    response = user_client.post('/api/recipes/favorite/batch/', data,
+                                format='json')
+    assert response.status_code == 400
+
+
+def test_batch_anonymous(anonymous_client):
+    response = anonymous_client.post('/api/recipes/favorite/batch/',
+                                     {'recipes': [1]}, format='json')
+    assert response.status_code == 401
+
+
+async def asgi_get(path, query_string, headers):
+    """Запрос через ASGIHandler: тело ответа читается в async-контексте."""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await get_asgi_application()({
+        'type': 'http', 'method': 'GET', 'path': path,
+        'query_string': query_string.encode(), 'headers': headers,
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }, receive, send)
+    return messages
+
+
+@pytest.mark.parametrize('file_format', ('txt', 'csv', 'pdf'))
+def test_download_shopping_cart_asgi(user, file_format):
+    token, _ = Token.objects.get_or_create(user=user)
+    request_finished.disconnect(close_old_connections)
+    try:
+        messages = async_to_sync(asgi_get)(
+            '/api/recipes/download_shopping_cart/', f'format={file_format}',
+            [(b'authorization', f'Token {token.key}'.encode())],
+        )
+    finally:
+        request_finished.connect(close_old_connections)
+    start, *body = messages
+    assert start['status'] == 200
+    content = b''.join(message.get('body', b'') for message in body)
+    if file_format != 'pdf':
+        name = ShoppingListItem.objects.filter(user=user).values_list(
+            'name', flat=True
+        ).first()
+        assert name in content.decode()
+    assert content
+
+
+@pytest.mark.parametrize('action, model', (
+    ('favorite', Favorite),
+    ('shopping_cart', ShoppingCart),
+))
+def test_add_integrity_error_not_conflict(user_client, user, author, action,
+                                          model):
+    recipe = Recipe.objects.filter(author=author).first()
+
+    def fail(**kwargs):
+        raise IntegrityError('receiver failed')
+
+    post_save.connect(fail, sender=model, dispatch_uid='test_fail')
+    try:
+        with pytest.raises(IntegrityError):
+            user_client.post(f'/api/recipes/{recipe.pk}/{action}/')
+    finally:
+        post_save.disconnect(sender=model, dispatch_uid='test_fail')
+    assert not model.objects.filter(user=user, recipe=recipe).exists()
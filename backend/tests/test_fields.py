@@ -0,0 +1,44 @@
+import tracemalloc
+from base64 import b64encode, encodebytes
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from rest_framework import serializers
+
+from api.fields import BASE64_CHUNK_SIZE, StreamingImageField
+
+
+def png_base64(size, encode=b64encode):
+    buffer = BytesIO()
+    Image.effect_noise(size, 100).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + encode(buffer.getvalue()).decode()
+
+
+@pytest.mark.parametrize('encode', (b64encode, encodebytes))
+def test_streaming_image_field_decodes(encode):
+    data = png_base64((300, 300), encode)
+    assert len(data) > BASE64_CHUNK_SIZE
+    file = StreamingImageField().to_internal_value(data)
+    assert file.name.endswith('.png')
+    assert Image.open(file).size == (300, 300)
+
+
+def test_streaming_image_field_rejects_garbage():
+    with pytest.raises(serializers.ValidationError):
+        StreamingImageField().to_internal_value('data:image/png;base64,abc')
+
+
+def test_streaming_image_field_bounded_memory(monkeypatch):
+    # Файл сразу пишется на диск, в памяти остаются только части строки.
+    monkeypatch.setattr('api.fields.IMAGE_SPOOL_SIZE', 1)
+    data = png_base64((1000, 1000), encodebytes)
+    field = StreamingImageField()
+    tracemalloc.start()
+    try:
+        file = field.decode(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert Image.open(file).size == (1000, 1000)
+    assert peak < 8 * BASE64_CHUNK_SIZE < len(data)
@@ -0,0 +1,23 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from recipes.models import Recipe
+from users.models import User
+
+
+def test_generate_data_counts_and_rerun(db):
+    User.objects.create(username='gen0', email='gen0@foodgram.ru')
+    stdout = StringIO()
+    call_command('generate_data', '--users', '3', '--prefix', 'gen',
+                 stdout=stdout)
+    output = stdout.getvalue()
+    assert f'{User._meta.verbose_name_plural}: 2, уже были - 1' in output
+    assert f'{Recipe._meta.verbose_name_plural}: 9 (' in output
+    recipes = Recipe.objects.filter(author__username__startswith='gen')
+    assert recipes.count() == 9
+    with pytest.raises(CommandError):
+        call_command('generate_data', '--users', '3', '--prefix', 'gen',
+                     stdout=StringIO())
+    assert recipes.count() == 9
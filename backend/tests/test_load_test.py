@@ -0,0 +1,32 @@
+from itertools import islice
+
+from api.management.commands.load_test import MixScenario
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+def test_mix_scenario_skips_seeded_lists(user, author):
+    users = (user.pk, author.pk)
+    # Половина рецептов уже в списках, иначе совпадения редки.
+    recipes = list(Recipe.objects.values_list('pk', flat=True)[::2])
+    for model in (Favorite, ShoppingCart):
+        model.objects.bulk_create(
+            (model(user_id=user_id, recipe_id=pk)
+             for user_id in users for pk in recipes),
+            ignore_conflicts=True,
+        )
+    scenario = MixScenario(0, users)
+    for worker, user_id in enumerate(users):
+        taken = {
+            action: set(model.objects.filter(
+                user_id=user_id
+            ).values_list('recipe_id', flat=True))
+            for action, model in (('favorite', Favorite),
+                                  ('shopping_cart', ShoppingCart))
+        }
+        changed = 0
+        for _, method, path, _ in islice(scenario(worker), 2000):
+            if method in ('POST', 'DELETE'):
+                _, _, _, recipe, action, _ = path.split('/')
+                assert int(recipe) not in taken[action]
+                changed += 1
+        assert changed
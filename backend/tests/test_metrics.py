@@ -0,0 +1,54 @@
+import os
+
+import pytest
+from django.core.cache import cache
+
+from api.metrics import Metrics, metrics
+
+
+@pytest.fixture
+def query_metrics(settings):
+    settings.QUERY_METRICS = True
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+def test_serialize_seconds(query_metrics, anonymous_client):
+    response = anonymous_client.get('/api/recipes/')
+    assert response.status_code == 200
+    stats = query_metrics.snapshot()['GET recipes-list']
+    assert stats['serialize_seconds']['count'] == 1
+    assert 0 < stats['serialize_seconds']['sum'] < (
+        stats['duration_seconds']['sum']
+    )
+
+
+def test_collect_workers(db):
+    first, second = Metrics(), Metrics()
+    first.record('GET view', False, queries=2)
+    second.record('GET view', True, queries=5)
+    cache.set(Metrics.worker_key(os.getpid() + 1), second.raw())
+    cache.set(Metrics.WORKERS_KEY,
+              cache.get(Metrics.WORKERS_KEY) | {os.getpid() + 1})
+    stats = first.collect()['GET view']
+    assert stats['count'] == 2
+    assert stats['over_budget'] == 1
+    assert stats['queries']['sum'] == 7
+    assert stats['queries']['percentiles'][0] == 3.5
+
+
+def test_collect_drops_expired_workers(db):
+    worker = Metrics()
+    worker.record('GET view', False, queries=1)
+    cache.set(Metrics.WORKERS_KEY, {os.getpid(), os.getpid() + 1})
+    assert worker.collect()['GET view']['count'] == 1
+    assert cache.get(Metrics.WORKERS_KEY) == {os.getpid()}
+
+
+def test_metrics_view(query_metrics, anonymous_client):
+    anonymous_client.get('/api/tags/')
+    response = anonymous_client.get('/internal/metrics/')
+    assert response.status_code == 200
+    assert ('foodgram_request_serialize_seconds_count'
+            '{view="GET tags-list"} 1') in response.content.decode()
@@ -0,0 +1,26 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.management.commands import explain_queries
+from recipes.models import Ingredient
+
+
+def test_hot_paths_use_indexes(user, monkeypatch):
+    # Тестовое окружение уже настроено pytest-django.
+    monkeypatch.setattr(explain_queries, 'setup_test_environment',
+                        lambda: None)
+    stdout = StringIO()
+    call_command('explain_queries', '--email', user.email, stdout=stdout)
+    assert 'ОШИБКА' not in stdout.getvalue()
+
+
+def test_full_index_scan_detected(db):
+    command = explain_queries.Command()
+    command.table_rows = {}
+    sql = str(Ingredient.objects.values_list(
+        'pk', 'name', 'measurement_unit'
+    ).query)
+    assert [(table, rows) for _, table, rows in command.scans(sql)] == [
+        ('recipes_ingredient', Ingredient.objects.count())
+    ]
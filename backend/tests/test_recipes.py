@@ -0,0 +1,336 @@
+import pytest
+from django.db.models import F
+
+from api.constants import PAGE_SIZE, TRENDING_FAVORITE_WEIGHT
+from recipes.models import (Favorite, FeedItem, Recipe, RecipeTrend,
+                            ShoppingCart, Tag)
+from recipes.trending import decay
+from users.models import Follow
+
+RECIPE_SHORT_FIELDS = {'id', 'name', 'image', 'image_variants',
+                       'cooking_time'}
+RECIPE_FIELDS = {'id', 'author', 'name', 'text', 'ingredients', 'tags',
+                 'cooking_time', 'image', 'image_variants'}
+RECIPE_DETAIL_FIELDS = RECIPE_FIELDS | {'is_favorited', 'is_in_shopping_cart'}
+
+
+def assert_recipe_page(response):
+    assert response.status_code == 200
+    assert {'next', 'previous', 'results'} <= set(response.data)
+    assert response.data['results']
+    for recipe in response.data['results']:
+        assert set(recipe) == RECIPE_SHORT_FIELDS
+
+
+@pytest.mark.parametrize('url, limit', (
+    ('/api/recipes/', 5),
+    ('/api/recipes/?limit=50', 5),
+    ('/api/recipes/?page=20', 5),
+    ('/api/recipes/?cursor=', 4),
+    ('/api/recipes/?cursor=&limit=50', 4),
+    ('/api/recipes/?tags=breakfast&tags=lunch', 6),
+    ('/api/recipes/?author={author}', 6),
+    ('/api/recipes/?ordering=popular', 5),
+    ('/api/recipes/?ordering=trending', 5),
+    ('/api/recipes/?search=Рецепт', 5),
+))
+def test_recipes_list(anonymous_client, user_client, author,
+                      django_assert_max_num_queries, url, limit):
+    url = url.format(author=author.pk)
+    with django_assert_max_num_queries(limit):
+        assert_recipe_page(anonymous_client.get(url))
+    with django_assert_max_num_queries(limit + 1):
+        assert_recipe_page(user_client.get(url))
+
+
+def test_recipes_trending(anonymous_client, user_client, user):
+    trends = RecipeTrend.objects.all()
+    response = anonymous_client.get('/api/recipes/?ordering=trending')
+    assert response.data['count'] == trends.count()
+    assert [recipe['id'] for recipe in response.data['results']] == [
+        recipe_id for _, recipe_id in sorted(
+            trends.values_list('score', 'recipe_id'),
+            key=lambda row: (-row[0], -row[1]),
+        )[:PAGE_SIZE]
+    ]
+    favorite = Favorite.objects.filter(user=user).first()
+    score = trends.get(recipe=favorite.recipe_id).score
+    user_client.delete(f'/api/recipes/{favorite.recipe_id}/favorite/')
+    assert trends.get(recipe=favorite.recipe_id).score == pytest.approx(
+        score - TRENDING_FAVORITE_WEIGHT * decay(
+            trends.get(recipe=favorite.recipe_id).refreshed_at
+            - favorite.date_added
+        )
+    )
+
+
+def test_recipes_trending_ties(anonymous_client):
+    RecipeTrend.objects.update(score=1)
+    response = anonymous_client.get('/api/recipes/?ordering=trending')
+    assert [recipe['id'] for recipe in response.data['results']] == list(
+        RecipeTrend.objects.order_by('-recipe_id').values_list(
+            'recipe_id', flat=True
+        )[:PAGE_SIZE]
+    )
+
+
+def test_recipes_cursor_keyset(anonymous_client, author):
+    Recipe.objects.filter(author=author).update(
+        pub_date=Recipe.objects.filter(author=author).values('pub_date')[:1]
+    )
+    url = f'/api/recipes/?author={author.pk}&cursor=&limit=2'
+    expected = list(Recipe.objects.filter(author=author).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', flat=True))
+    pages = []
+    while url:
+        response = anonymous_client.get(url)
+        assert response.status_code == 200
+        pages.append(response.data)
+        url = response.data['next']
+    assert [recipe['id'] for page in pages
+            for recipe in page['results']] == expected
+    assert pages[0]['previous'] is None
+    response = anonymous_client.get(pages[-1]['previous'])
+    assert response.data['results'] == pages[-2]['results']
+
+
+@pytest.mark.parametrize('url', (
+    '/api/recipes/?cursor=&ordering=popular',
+    '/api/recipes/?cursor=&ordering=trending',
+))
+def test_recipes_cursor_ordering(anonymous_client, url):
+    response = anonymous_client.get(url)
+    assert response.status_code == 400
+
+
+def test_recipes_invalid_cursor(anonymous_client):
+    response = anonymous_client.get('/api/recipes/?cursor=bad')
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize('url', (
+    '/api/recipes/?is_favorited=1',
+    '/api/recipes/?is_in_shopping_cart=1',
+))
+def test_recipes_list_user_filters(user_client,
+                                   django_assert_max_num_queries, url):
+    with django_assert_max_num_queries(6):
+        assert_recipe_page(user_client.get(url))
+
+
+def test_recipes_tags_filter(anonymous_client):
+    expected = list(Recipe.objects.filter(
+        tags__slug__in=('breakfast', 'lunch')
+    ).distinct().order_by('-pub_date', '-id').values_list('id', flat=True))
+    response = anonymous_client.get(
+        '/api/recipes/?tags=breakfast&tags=lunch&limit=50'
+    )
+    assert response.data['count'] == len(expected)
+    assert [recipe['id'] for recipe
+            in response.data['results']] == expected[:50]
+
+
+def test_recipe_tags_mask(author):
+    recipe = Recipe.objects.filter(author=author).first()
+    breakfast, lunch, dinner = (Tag.objects.get(slug=slug) for slug
+                                in ('breakfast', 'lunch', 'dinner'))
+
+    def mask():
+        recipe.refresh_from_db(fields=('tags_mask',))
+        return recipe.tags_mask
+
+    recipe.tags.set((breakfast, dinner))
+    assert mask() == breakfast.mask | dinner.mask
+    recipe.tags.remove(dinner)
+    assert mask() == breakfast.mask
+    lunch.recipes.add(recipe)
+    assert mask() == breakfast.mask | lunch.mask
+    lunch.recipes.clear()
+    assert mask() == breakfast.mask
+    recipe.tags.clear()
+    assert mask() == 0
+    recipe.tags.add(dinner)
+    dinner.delete()
+    assert mask() == 0
+    tag = Tag.objects.create(name='Перекус', color='#000000', slug='snack')
+    assert tag.bit == dinner.bit
+
+
+def test_recipe_save_keeps_denormalized_fields(author):
+    recipe = Recipe.objects.filter(author=author).first()
+    variants = {'source': recipe.image.name}
+    Recipe.objects.filter(pk=recipe.pk).update(
+        favorites_count=F('favorites_count') + 5,
+        in_carts_count=F('in_carts_count') + 3,
+        image_variants=variants,
+    )
+    recipe.name = 'Новое название'
+    recipe.save()
+    saved = Recipe.objects.get(pk=recipe.pk)
+    assert saved.name == 'Новое название'
+    assert saved.favorites_count == recipe.favorites_count + 5
+    assert saved.in_carts_count == recipe.in_carts_count + 3
+    assert saved.image_variants == variants
+
+
+def test_recipe_detail(anonymous_client, user_client,
+                       django_assert_max_num_queries):
+    recipe = Recipe.objects.first()
+    for client, limit in ((anonymous_client, 3), (user_client, 4)):
+        with django_assert_max_num_queries(limit):
+            response = client.get(f'/api/recipes/{recipe.pk}/')
+        assert response.status_code == 200
+        assert set(response.data) == RECIPE_DETAIL_FIELDS
+        assert len(response.data['ingredients']) == (
+            recipe.ingredients_amount.count()
+        )
+
+
+def test_recipe_detail_user_flags(anonymous_client, user_client, user,
+                                  django_assert_max_num_queries):
+    recipe = Recipe.objects.filter(favorite__user=user).exclude(
+        author__following__user=user
+    ).first()
+    url = f'/api/recipes/{recipe.pk}/'
+    anonymous_client.get(url)
+    with django_assert_max_num_queries(2):
+        response = user_client.get(url)
+    assert response.data['is_favorited'] is True
+    assert response.data['is_in_shopping_cart'] == (
+        ShoppingCart.objects.filter(user=user, recipe=recipe).exists()
+    )
+    assert response.data['author']['is_subscribed'] is False
+    Follow.objects.create(user=user, author=recipe.author)
+    Favorite.objects.filter(user=user, recipe=recipe).delete()
+    response = user_client.get(url)
+    assert response.data['is_favorited'] is False
+    assert response.data['author']['is_subscribed'] is True
+    response = anonymous_client.get(url)
+    assert response.data['is_favorited'] is False
+    assert response.data['author']['is_subscribed'] is False
+
+
+def test_feed(user_client, user, django_assert_max_num_queries):
+    expected = list(Recipe.objects.filter(
+        author__following__user=user
+    ).order_by('-pub_date', '-id').values_list('id', flat=True))
+    for url in ('/api/recipes/feed/', '/api/recipes/feed/?limit=50'):
+        with django_assert_max_num_queries(6):
+            response = user_client.get(url)
+        assert_recipe_page(response)
+        assert response.data['count'] == len(expected)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        assert ids == expected[:len(ids)]
+
+
+def test_feed_anonymous(anonymous_client, django_assert_max_num_queries):
+    with django_assert_max_num_queries(0):
+        response = anonymous_client.get('/api/recipes/feed/')
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize('method', ('post', 'patch', 'delete'))
+def test_recipe_write_anonymous(anonymous_client, recipe_payload,
+                                django_assert_max_num_queries, method):
+    recipe = Recipe.objects.first()
+    url = ('/api/recipes/' if method == 'post'
+           else f'/api/recipes/{recipe.pk}/')
+    with django_assert_max_num_queries(0):
+        response = getattr(anonymous_client, method)(
+            url, recipe_payload, format='json'
+        )
+    assert response.status_code == 401
+
+
+def test_recipe_create_update_delete(user_client, user, recipe_payload,
+                                     django_assert_max_num_queries):
+    with django_assert_max_num_queries(20):
+        response = user_client.post('/api/recipes/', recipe_payload,
+                                    format='json')
+    assert response.status_code == 201, response.data
+    assert set(response.data) == RECIPE_FIELDS
+    assert len(response.data['ingredients']) == 3
+    recipe_id = response.data['id']
+    assert FeedItem.objects.filter(recipe_id=recipe_id).count() == (
+        user.following.count()
+    )
+    recipe_payload['ingredients'][0]['amount'] = 75
+    recipe_payload['ingredients'].pop()
+    recipe_payload['name'] = 'Изменённый рецепт'
+    del recipe_payload['image']
+    with django_assert_max_num_queries(20):
+        response = user_client.patch(f'/api/recipes/{recipe_id}/',
+                                     recipe_payload, format='json')
+    assert response.status_code == 200, response.data
+    assert response.data['name'] == 'Изменённый рецепт'
+    assert [ingredient['amount'] for ingredient
+            in response.data['ingredients']] == [75, 50]
+    with django_assert_max_num_queries(14):
+        response = user_client.delete(f'/api/recipes/{recipe_id}/')
+    assert response.status_code == 204
+    assert not Recipe.objects.filter(pk=recipe_id).exists()
+
+
+def test_recipe_update_by_other_user(user_client, author, recipe_payload):
+    recipe = Recipe.objects.filter(author=author).first()
+    response = user_client.patch(f'/api/recipes/{recipe.pk}/',
+                                 recipe_payload, format='json')
+    assert response.status_code == 403
+
+
+def test_recipe_detail_cached(anonymous_client, user_client, user,
+                              recipe_payload, django_assert_max_num_queries,
+                              django_capture_on_commit_callbacks):
+    recipe = Recipe.objects.filter(author=user).first()
+    url = f'/api/recipes/{recipe.pk}/'
+    anonymous_client.get(url)
+    with django_assert_max_num_queries(0):
+        response = anonymous_client.get(url)
+    assert response.data['name'] == recipe.name
+    del recipe_payload['image']
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.patch(url, recipe_payload, format='json')
+    response = anonymous_client.get(url)
+    assert response.data['name'] == recipe_payload['name']
+
+
+def test_recipe_detail_cached_padded_pk(anonymous_client, user_client, user,
+                                        recipe_payload,
+                                        django_capture_on_commit_callbacks):
+    recipe = Recipe.objects.filter(author=user).first()
+    url = f'/api/recipes/{recipe.pk:06d}/'
+    assert anonymous_client.get(url).data['name'] == recipe.name
+    del recipe_payload['image']
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.patch(f'/api/recipes/{recipe.pk}/', recipe_payload,
+                          format='json')
+    response = anonymous_client.get(url)
+    assert response.data['name'] == recipe_payload['name']
+
+
+def test_recipe_detail_invalid_pk(anonymous_client,
+                                  django_assert_max_num_queries):
+    with django_assert_max_num_queries(0):
+        response = anonymous_client.get('/api/recipes/abc/')
+    assert response.status_code == 404
+
+
+def test_recipe_patch_tags_filter(user_client, user, recipe_payload):
+    recipe = Recipe.objects.filter(author=user).first()
+    old, new = Tag.objects.order_by('bit')[:2]
+    recipe.tags.set((old,))
+    del recipe_payload['image']
+    recipe_payload['tags'] = [new.pk]
+    response = user_client.patch(f'/api/recipes/{recipe.pk}/',
+                                 recipe_payload, format='json')
+    assert response.status_code == 200, response.data
+
+    def found(tag):
+        response = user_client.get(
+            f'/api/recipes/?author={user.pk}&tags={tag.slug}'
+        )
+        return recipe.pk in {item['id'] for item in response.data['results']}
+
+    assert found(new)
+    assert not found(old)
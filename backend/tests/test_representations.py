@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import FastJSONRenderer, ShoppingListRenderer
+from api.representations import (RECIPE_SHORT_FIELDS, USER_FIELDS,
+                                 recipe_short_data, subscribed_authors,
+                                 user_data)
+from api.serializers import RecipeSubscriptionSerializer, UserReadSerializer
+from recipes.models import Recipe
+from users.models import User
+
+PAGE_SIZE = 20
+
+
+def make_request(user):
+    request = APIRequestFactory().get('/api/recipes/')
+    request.user = user
+    return request
+
+
+def render_both(slow, fast):
+    return JSONRenderer().render(slow), FastJSONRenderer().render(fast)
+
+
+def by_pk(queryset, pks):
+    objects = queryset.in_bulk(pks)
+    return [objects[pk] for pk in pks]
+
+
+def test_recipe_short_data_matches_serializer(user):
+    recipes = list(Recipe.objects.order_by('pk').values_list(
+        'pk', flat=True
+    )[:PAGE_SIZE])
+    Recipe.objects.filter(pk=recipes[0]).update(image='')
+    Recipe.objects.filter(pk=recipes[1]).update(image_variants={
+        'thumbnail': 'recipes/images/seed_thumbnail.jpg'
+    })
+    queryset = Recipe.objects.filter(pk__in=recipes).order_by('pk')
+    request = make_request(user)
+    slow, fast = render_both(
+        RecipeSubscriptionSerializer(queryset, many=True,
+                                     context={'request': request}).data,
+        recipe_short_data(queryset.values(*RECIPE_SHORT_FIELDS), request),
+    )
+    assert slow == fast
+    assert b'"image":null' in fast
+    assert b'seed_thumbnail.jpg' in fast
+
+
+def test_user_data_matches_serializer(user):
+    queryset = User.objects.order_by('pk')[:PAGE_SIZE]
+    for current in (AnonymousUser(), user):
+        request = make_request(current)
+        slow, fast = render_both(
+            UserReadSerializer(queryset, many=True,
+                               context={'request': request}).data,
+            user_data(queryset.values(*USER_FIELDS), request),
+        )
+        assert slow == fast
+    assert b'"is_subscribed":true' in fast
+
+
+def test_subscribed_authors_single_table(user):
+    request = make_request(user)
+    with CaptureQueriesContext(connection) as queries:
+        subscriptions = subscribed_authors(request)
+        subscribed_authors(request)
+    assert subscriptions == set(
+        user.follower.values_list('author_id', flat=True)
+    )
+    assert len(queries) == 1
+    sql = queries[0]['sql']
+    assert 'JOIN' not in sql
+    assert 'ORDER BY' not in sql
+
+
+@pytest.mark.parametrize('url, serializer, model', (
+    ('/api/recipes/?limit=20', RecipeSubscriptionSerializer, Recipe),
+    ('/api/recipes/?cursor=&limit=20', RecipeSubscriptionSerializer, Recipe),
+    ('/api/recipes/feed/', RecipeSubscriptionSerializer, Recipe),
+    ('/api/users/?limit=20', UserReadSerializer, User),
+))
+def test_list_endpoints_match_serializer(user_client, url, serializer,
+                                         model):
+    response = user_client.get(url)
+    assert response.status_code == 200
+    pks = [item['id'] for item in response.data['results']]
+    assert pks
+    expected = {**response.data, 'results': serializer(
+        by_pk(model.objects, pks), many=True,
+        context={'request': response.wsgi_request},
+    ).data}
+    assert response.content == JSONRenderer().render(expected)
+
+
+@pytest.mark.parametrize('data', (
+    {'name': 'Борщ "украинский" \\ с\tтабуляцией\n'},
+    {'text': 'разделители   строк   и </script>'},
+    {'emoji': '🍲', 'control': '\x00\x1f\x7f'},
+    [None, True, False, 0, -1, 2 ** 53, 'ё'],
+    {'nested': {'list': [{'id': 1}], 'empty': {}}, 1: 'ключ-число'},
+    {'date': datetime(2023, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc),
+     'amount': Decimal('1.50')},
+))
+def test_fast_renderer_matches_json_renderer(data):
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_shopping_list_renderer_is_abstract():
+    with pytest.raises(TypeError):
+        ShoppingListRenderer()
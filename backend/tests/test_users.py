@@ -0,0 +1,159 @@
+import pytest
+from django.db.models import F
+
+from api.constants import RECIPES_LIMIT
+from users.models import Follow, User
+
+USER_FIELDS = {'email', 'id', 'username', 'first_name', 'last_name',
+               'is_subscribed'}
+FOLLOW_FIELDS = {'email', 'id', 'username', 'first_name', 'last_name',
+                 'is_subscribed', 'recipes', 'recipes_count'}
+RECIPE_SHORT_FIELDS = {'id', 'name', 'image', 'image_variants',
+                       'cooking_time'}
+
+
+@pytest.mark.parametrize('url, limit', (
+    ('/api/users/', 4),
+    ('/api/users/?limit=50', 4),
+    ('/api/users/?page=10', 4),
+))
+def test_users_list(anonymous_client, user_client,
+                    django_assert_max_num_queries, url, limit):
+    for client in (anonymous_client, user_client):
+        with django_assert_max_num_queries(limit):
+            response = client.get(url)
+        assert response.status_code == 200
+        assert {'count', 'next', 'previous', 'results'} <= set(response.data)
+        assert response.data['results']
+        for user in response.data['results']:
+            assert set(user) == USER_FIELDS
+
+
+@pytest.mark.parametrize('url', (
+    '/api/users/{author}/',
+    '/api/users/me/',
+    '/api/users/subscriptions/',
+))
+def test_users_anonymous_forbidden(anonymous_client, author,
+                                   django_assert_max_num_queries, url):
+    with django_assert_max_num_queries(1):
+        response = anonymous_client.get(url.format(author=author.pk))
+    assert response.status_code == 401
+
+
+def test_user_detail(user_client, author, django_assert_max_num_queries):
+    with django_assert_max_num_queries(3):
+        response = user_client.get(f'/api/users/{author.pk}/')
+    assert response.status_code == 200
+    assert set(response.data) == USER_FIELDS
+
+
+def test_user_me(user_client, user, django_assert_max_num_queries):
+    with django_assert_max_num_queries(2):
+        response = user_client.get('/api/users/me/')
+    assert response.status_code == 200
+    assert set(response.data) == USER_FIELDS
+    assert response.data['id'] == user.pk
+
+
+@pytest.mark.parametrize('url', (
+    '/api/users/subscriptions/',
+    '/api/users/subscriptions/?limit=50',
+    '/api/users/subscriptions/?recipes_limit=1',
+))
+def test_subscriptions(user_client, django_assert_max_num_queries, url):
+    with django_assert_max_num_queries(5):
+        response = user_client.get(url)
+    assert response.status_code == 200
+    assert response.data['results']
+    for author in response.data['results']:
+        assert set(author) == FOLLOW_FIELDS
+        assert author['is_subscribed'] is True
+        assert author['recipes_count'] >= len(author['recipes'])
+        for recipe in author['recipes']:
+            assert set(recipe) == RECIPE_SHORT_FIELDS
+
+
+def test_subscribe_and_unsubscribe(user_client, user, author,
+                                   django_assert_max_num_queries):
+    url = f'/api/users/{author.pk}/subscribe/'
+    with django_assert_max_num_queries(12):
+        response = user_client.post(url)
+    assert response.status_code == 201
+    assert response.data['is_subscribed'] is True
+    assert Follow.objects.filter(user=user, author=author).exists()
+    assert len(response.data['recipes']) == min(author.recipes_count,
+                                                RECIPES_LIMIT)
+    with django_assert_max_num_queries(6):
+        response = user_client.post(url)
+    assert response.status_code == 400
+    with django_assert_max_num_queries(8):
+        response = user_client.delete(url)
+    assert response.status_code == 204
+    assert not Follow.objects.filter(user=user, author=author).exists()
+
+
+def test_subscribe_recipes_limit(user_client, author):
+    response = user_client.post(
+        f'/api/users/{author.pk}/subscribe/?recipes_limit=1'
+    )
+    assert response.status_code == 201
+    assert len(response.data['recipes']) == 1
+    assert response.data['recipes_count'] > 1
+
+
+def test_subscribe_anonymous(anonymous_client, author,
+                             django_assert_max_num_queries):
+    with django_assert_max_num_queries(0):
+        response = anonymous_client.post(f'/api/users/{author.pk}/subscribe/')
+    assert response.status_code == 401
+
+
+def test_user_create(anonymous_client, django_assert_max_num_queries):
+    with django_assert_max_num_queries(5):
+        response = anonymous_client.post('/api/users/', {
+            'email': 'new@foodgram.ru',
+            'username': 'new_user',
+            'first_name': 'Имя',
+            'last_name': 'Фамилия',
+            'password': 'Seed-password-456',
+        })
+    assert response.status_code == 201
+    assert set(response.data) == {'email', 'id', 'username', 'first_name',
+                                  'last_name'}
+
+
+def test_set_password(user_client, django_assert_max_num_queries):
+    with django_assert_max_num_queries(3):
+        response = user_client.post('/api/users/set_password/', {
+            'current_password': 'Seed-password-123',
+            'new_password': 'Seed-password-789',
+        })
+    assert response.status_code == 200
+
+
+def test_user_save_keeps_counters(user):
+    User.objects.filter(pk=user.pk).update(
+        recipes_count=F('recipes_count') + 2,
+        followers_count=F('followers_count') + 7,
+    )
+    user.set_password('Seed-password-456')
+    user.save()
+    saved = User.objects.get(pk=user.pk)
+    assert saved.check_password('Seed-password-456')
+    assert saved.recipes_count == user.recipes_count + 2
+    assert saved.followers_count == user.followers_count + 7
+
+
+def test_token_login_and_logout(anonymous_client, user,
+                                django_assert_max_num_queries):
+    with django_assert_max_num_queries(6):
+        response = anonymous_client.post('/api/auth/token/login/', {
+            'email': user.email, 'password': 'Seed-password-123',
+        })
+    assert response.status_code == 200
+    token = response.data['auth_token']
+    anonymous_client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    with django_assert_max_num_queries(3):
+        response = anonymous_client.post('/api/auth/token/logout/')
+    assert response.status_code == 204
@@ -3,7 +3,25 @@ from django.db import models
 from django.db.models import DateTimeField
 
 
-class User(AbstractUser):
+class DenormalizedFieldsMixin:
+    """
+    Поля denormalized_fields меняются только запросами UPDATE: через F()
+    в сигналах или пересчётом. Обычное save() существующего объекта их
+    не записывает, иначе значение из памяти затрёт параллельные изменения.
+    """
+    denormalized_fields = ()
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is None and not self._state.adding:
+            skipped = {*self.denormalized_fields, *self.get_deferred_fields()}
+            update_fields = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class User(DenormalizedFieldsMixin, AbstractUser):
     """Модель юзера."""
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name',)
@@ -31,6 +49,18 @@ class User(AbstractUser):
         max_length=10,
         verbose_name='Уровень доступа пользователей',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков',
+    )
+
+    denormalized_fields = ('recipes_count', 'followers_count')
 
     @property
     def is_admin(self):
@@ -52,6 +82,7 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='follower',
+        db_index=False,
         verbose_name='Подписчик'
     )
     author = models.ForeignKey(